@@ -0,0 +1,141 @@
+"""
+Micro-benchmark of the matrix kernels in libs/calculate_cost.py against the scalar reference functions.
+Before timing, every kernel is checked to give the same matrix as filling it pair by pair with the
+scalar functions (iou(), iou_ext_sep(), ios(), area_cost(), outside()), and the gated association of
+libs/gating.py is checked to give the same result as the dense association on random frames.
+Run from the repository root:
+    python -m benchmarks.bench_cost
+"""
+from __future__ import print_function
+import time
+import numpy as np
+from libs import calculate_cost
+from libs import association
+from libs import tracker
+
+
+def random_boxes(n, rng, scene=(1920, 1080)):
+    xy = rng.rand(n, 2) * scene
+    wh = rng.uniform(20, 200, (n, 2))
+    return np.concatenate((xy, xy + wh, rng.rand(n, 1)), axis=1)
+
+
+# reference implementations: the double loops that used to fill the matrices in calculate_cost
+def loop_pairs(func, first, second, skip_diagonal=False):
+    matrix = np.zeros((len(first), len(second)), dtype=np.float32)
+    for i, a in enumerate(first):
+        for j, b in enumerate(second):
+            if not (skip_diagonal and i == j):
+                matrix[i, j] = func(a, b)
+    return matrix
+
+
+def loop_outside(trackers, img_s):
+    out = np.zeros(len(trackers), dtype=np.float32)
+    for t, trk in enumerate(trackers):
+        out[t] = calculate_cost.outside(trk, img_s)
+    return out
+
+
+def loop_iou_ext_sep(detections, trackers, ext_w, ext_h):
+    matrix = np.zeros((len(detections), len(trackers)), dtype=np.float32)
+    for d, det in enumerate(detections):
+        for t, trk in enumerate(trackers):
+            matrix[d, t] = calculate_cost.iou_ext_sep(det, trk, ext_w[t], ext_h[t])
+    return matrix
+
+
+def associate(dets, trks, gated):
+    """
+    Associates dets to new targets at the boxes trks with a tracker in dense or gated mode, returns
+    (det_trk, unmatched detections, unmatched targets)
+    """
+    mot_tracker = tracker.Sort_OH(batched=True, gated=gated)
+    mot_tracker.next_id = 0
+    for trk in trks:
+        mot_tracker.add_tracker(trk[0:4], 0, None)
+    assignment = association.associate_detections_to_trackers(mot_tracker, dets, trks, np.empty((0, 5)), 1.)
+    return assignment.det_trk.copy(), assignment.unmatched_dets.copy(), assignment.unmatched_trks.copy()
+
+
+def check_gated(sizes, frames, rng):
+    """
+    Checks that the gated association gives the same matches as the dense one. When there are not more
+    detections than targets, the dense assignment gives every detection a pair and the unmatched detections
+    are in ascending order in both modes, so their order is checked, too. The dense mode puts targets of pairs
+    with low IoU after the targets without a pair, so unmatched targets are compared as sets.
+    """
+    for n in sizes:
+        for frame in range(frames):
+            trks = random_boxes(n, rng)
+            # detections near a part of the targets, some of them shifted below the IoU threshold,
+            # and false positives, fewer or more than the targets
+            found = rng.rand(n) < rng.uniform(0.5, 1.0)
+            dets = trks[found].copy()
+            dets[:, 0:4] += rng.randn(len(dets), 1) * rng.uniform(1, 40, (len(dets), 1))
+            num_fp = rng.randint(0, n // 10 + 1) if frame % 2 == 0 else n - len(dets) + rng.randint(1, n // 5 + 2)
+            dets = np.concatenate((dets, random_boxes(num_fp, rng)))
+            dets = dets[rng.permutation(len(dets))]
+            dense = associate(dets, trks, False)
+            gated = associate(dets, trks, True)
+            if not np.array_equal(dense[0], gated[0]):
+                raise AssertionError('gated association matches differ from dense for N=%d, frame %d' % (n, frame))
+            if len(dets) <= len(trks):
+                same_dets = np.array_equal(dense[1], gated[1])
+            else:
+                same_dets = np.array_equal(np.sort(dense[1]), gated[1])
+            if not same_dets or not np.array_equal(np.sort(dense[2]), np.sort(gated[2])):
+                raise AssertionError('gated association unmatched detections or targets differ from dense for '
+                                     'N=%d, frame %d' % (n, frame))
+    print('gated association: same matches and unmatched detections as dense on %d random frames'
+          % (len(sizes) * frames))
+
+
+def best_time(func, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes=(10, 50, 100, 200, 500), repeat=3):
+    rng = np.random.RandomState(0)
+    scene = np.array([1920, 1080])
+    check_gated(sizes, 20, rng)
+    print('%-12s %5s %5s %12s %12s %9s' % ('kernel', 'N', 'M', 'loop [ms]', 'matrix [ms]', 'speedup'))
+    for n in sizes:
+        dets = random_boxes(n, rng)
+        trks = random_boxes(n, rng)
+        # partially outside the image
+        trks[:n // 4, 0:4] -= 100
+        ext_w, ext_h = calculate_cost.ext_factors(rng.randint(0, 6, n))
+        cases = [
+            ('cal_iou', lambda: loop_pairs(calculate_cost.iou, dets, trks),
+             lambda: calculate_cost.cal_iou(dets, trks)),
+            ('cal_ios_mat', lambda: loop_pairs(calculate_cost.ios, trks, trks, True),
+             lambda: calculate_cost.cal_ios_matrix(trks)),
+            ('cal_area', lambda: loop_pairs(calculate_cost.area_cost, dets, trks),
+             lambda: calculate_cost.cal_area_cost(dets, trks)),
+            ('cal_ios', lambda: loop_pairs(calculate_cost.ios, dets, trks[0:1]),
+             lambda: calculate_cost.cal_ios(dets, trks[0])),
+            ('cal_outside', lambda: loop_outside(trks, scene),
+             lambda: calculate_cost.cal_outside(trks, scene)),
+            ('cal_iou_ext', lambda: loop_iou_ext_sep(dets, trks, ext_w, ext_h),
+             lambda: calculate_cost.cal_iou_ext_sep(dets, trks, ext_w, ext_h)),
+        ]
+        for name, reference, kernel in cases:
+            expected = reference()
+            result = kernel()
+            if not np.array_equal(expected, result):
+                raise AssertionError('%s differs from the scalar reference for N=%d, max diff %g'
+                                     % (name, n, np.abs(expected - result).max()))
+            t_loop = best_time(reference, repeat)
+            t_kernel = best_time(kernel, repeat)
+            print('%-12s %5d %5d %12.3f %12.3f %8.1fx' % (name, n, n, t_loop * 1000, t_kernel * 1000,
+                                                          t_loop / t_kernel))
+
+
+if __name__ == '__main__':
+    main()
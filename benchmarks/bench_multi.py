@@ -0,0 +1,63 @@
+"""
+Benchmark of tracking many small streams with one MultiSort_OH against one batched Sort_OH per stream.
+Before timing, the outputs of both are checked to be the same for every stream and frame.
+Run from the repository root:
+    python -m benchmarks.bench_multi --streams 200
+"""
+from __future__ import print_function
+import time
+import argparse
+import numpy as np
+from libs import tracker
+from libs import multi_tracker
+from benchmarks import synthetic
+
+
+def parse_args():
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description='SORT with occlusion handling multi-stream benchmark')
+    parser.add_argument('--streams', dest='streams', help='Number of streams [200]', type=int, default=200)
+    parser.add_argument('--objects', dest='objects', help='Maximum number of objects of a stream [10]',
+                        type=int, default=10)
+    parser.add_argument('--frames', dest='frames', help='Number of frames [50]', type=int, default=50)
+    args = parser.parse_args()
+    return args
+
+
+def run_separate(scenes):
+    outputs = []
+    start = time.perf_counter()
+    for s, frames in enumerate(scenes):
+        mot_tracker = tracker.Sort_OH(batched=True)
+        mot_tracker.seq = 'STREAM-%d' % s
+        mot_tracker.conf_trgt = 0.35
+        mot_tracker.conf_objt = 0.75
+        mot_tracker.next_id = 0
+        outputs.append([mot_tracker.update(dets, gts)[0] for frame, dets, gts, gt_ids in frames])
+    return outputs, time.perf_counter() - start
+
+
+def run_multi(scenes):
+    mot_tracker = multi_tracker.MultiSort_OH()
+    for s in range(len(scenes)):
+        mot_tracker.add_stream('STREAM-%d' % s)
+    outputs = [[] for _ in scenes]
+    start = time.perf_counter()
+    for k in range(len(scenes[0])):
+        results = mot_tracker.update([frames[k][1] for frames in scenes], [frames[k][2] for frames in scenes])
+        for s, res in enumerate(results):
+            outputs[s].append(res[0])
+    return outputs, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    scenes = [synthetic.scene_frames(1 + s % args.objects, args.frames, seed=s) for s in range(args.streams)]
+    separate, separate_time = run_separate(scenes)
+    multi, multi_time = run_multi(scenes)
+    for s in range(args.streams):
+        for k in range(args.frames):
+            assert np.array_equal(separate[s][k], multi[s][k]), 'stream %d, frame %d differs' % (s, k)
+    frames = args.streams * args.frames
+    print('%d streams, %d frames: separate %.1f stream-frames/s, multi %.1f stream-frames/s (%.2fx)'
+          % (args.streams, args.frames, frames / separate_time, frames / multi_time, separate_time / multi_time))
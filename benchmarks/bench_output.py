@@ -0,0 +1,85 @@
+"""
+Benchmark of writing tracker outputs with libs/results_sink.py on synthetic targets.
+Before timing, it checks that:
+  * TextSink writes the same file as formatting every target with print()
+  * the .npy file of NpySink is memory-mapped by mot_source.load_mot() with the same boxes and IDs
+Run from the repository root:
+    python -m benchmarks.bench_output
+"""
+from __future__ import print_function
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+from libs import results_sink
+from libs import mot_source
+
+
+def parse_args():
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description='SORT with occlusion handling output writer benchmark')
+    parser.add_argument('--objects', dest='objects', help='Number of targets in every frame [50]', type=int,
+                        default=50)
+    parser.add_argument('--frames', dest='frames', help='Number of frames [2000]', type=int, default=2000)
+    args = parser.parse_args()
+    return args
+
+
+def target_frames(num_objects, frames):
+    """
+    Returns the targets of every frame in the format [[x1,y1,x2,y2,id],...], as Sort_OH.update gives them
+    """
+    rng = np.random.RandomState(0)
+    result = []
+    for frame in range(frames):
+        trackers = np.zeros((num_objects, 5))
+        trackers[:, 0:2] = rng.rand(num_objects, 2) * [1920, 1080]
+        trackers[:, 2:4] = trackers[:, 0:2] + rng.uniform(20, 200, (num_objects, 2))
+        trackers[:, 4] = np.arange(num_objects) + 1
+        result.append(trackers)
+    return result
+
+
+def write_print(path, frames):
+    with open(path, 'w') as out_file:
+        for frame, trackers in enumerate(frames, 1):
+            for d in trackers:
+                print('%d,%d,%.2f,%.2f,%.2f,%.2f,1,-1,-1,-1' % (frame, d[4], d[0], d[1], d[2] - d[0], d[3] - d[1]),
+                      file=out_file)
+
+
+def write_sink(sink, frames):
+    with sink as out_file:
+        for frame, trackers in enumerate(frames, 1):
+            out_file.write(frame, trackers)
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    frames = target_frames(args.objects, args.frames)
+    folder = tempfile.mkdtemp()
+    print_path = os.path.join(folder, 'print.txt')
+    text_path = os.path.join(folder, 'sink.txt')
+    npy_path = os.path.join(folder, 'sink.npy')
+    print_time = timed(lambda: write_print(print_path, frames))
+    text_time = timed(lambda: write_sink(results_sink.TextSink(text_path), frames))
+    npy_time = timed(lambda: write_sink(results_sink.NpySink(npy_path), frames))
+
+    with open(print_path) as f1, open(text_path) as f2:
+        assert f1.read() == f2.read(), 'TextSink output differs from print()'
+    source = mot_source.load_mot(npy_path)
+    boxes = np.concatenate(frames)
+    assert np.array_equal(source.boxes[:, 0:4], boxes[:, 0:4]) and np.array_equal(source.ids, boxes[:, 4])
+    print('Outputs of %d targets are the same' % len(boxes))
+    print('print %.1f ms, TextSink %.1f ms (%.1fx), NpySink %.1f ms (%.1fx)'
+          % (print_time * 1000., text_time * 1000., print_time / text_time, npy_time * 1000., print_time / npy_time))
+    for path in (print_path, text_path, npy_path):
+        os.remove(path)
+    os.rmdir(folder)
@@ -0,0 +1,114 @@
+"""
+Benchmark of the matplotlib and OpenCV rendering backends of libs/visualization.py on a synthetic frame.
+Before timing, the drawn box geometry of both backends is checked against the overlay items:
+  * every matplotlib patch has the position, size and line style of its item
+  * every OpenCV rectangle, drawn alone on a blank image, covers the item box within half of its line width
+  * every OpenCV label (target IDs and detection scores), drawn alone, begins at the position of its item
+  OpenCV items are checked on full size and on half size images (--render_scale 0.5).
+Run from the repository root:
+    python -m benchmarks.bench_render
+"""
+from __future__ import print_function
+import io
+import time
+import argparse
+import numpy as np
+import cv2
+from libs import visualization
+from benchmarks import synthetic
+
+
+def parse_args():
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description='SORT with occlusion handling rendering benchmark')
+    parser.add_argument('--objects', dest='objects', help='Number of objects in the frame [50]', type=int, default=50)
+    parser.add_argument('--repeat', dest='repeat', help='Number of rendered frames of every backend [5]',
+                        type=int, default=5)
+    args = parser.parse_args()
+    return args
+
+
+def frame_items(num_objects):
+    """
+    Returns overlay items of a synthetic frame with every toggle enabled
+    """
+    frame, dets, gts, gt_ids = synthetic.scene_frames(num_objects, 1, seed=1)[0]
+    rng = np.random.RandomState(0)
+    trackers = np.concatenate((gts[:, 0:4] + rng.randn(len(gts), 4) * 3, gt_ids[:, None]), axis=1)
+    unmatched = trackers[:num_objects // 10] + [5, 5, 5, 5, 0]
+    extended = trackers[:num_objects // 10] + [-20, -10, 20, 10, 0]
+    state = dict((name, True) for name in visualization.display_state() if name.startswith('display'))
+    return visualization.overlay_items(dets, gts, trackers, unmatched, gts[:3], extended, state)
+
+
+def check_figure(rects, texts, im):
+    fig = visualization.draw_figure(im, rects, texts)
+    ax = fig.axes[0]
+    assert len(ax.patches) == len(rects)
+    for patch, (box, colour, linewidth, dashed) in zip(ax.patches, rects):
+        assert np.allclose([patch.get_x(), patch.get_y(), patch.get_x() + patch.get_width(),
+                            patch.get_y() + patch.get_height()], box[0:4])
+        assert patch.get_linewidth() == linewidth
+        assert (patch.get_linestyle() in ('--', 'dashed')) == dashed
+    assert len(ax.texts) == len(texts)
+
+
+def check_cv(rects, texts, shape, scale=1.):
+    shape = (int(round(shape[0] * scale)), int(round(shape[1] * scale)), shape[2])
+    for box, colour, linewidth, dashed in rects:
+        im = np.zeros(shape, dtype=np.uint8)
+        visualization.draw_cv(im, [(box, colour if colour != 'k' else 'w', linewidth, dashed)], [], scale)
+        ys, xs = np.nonzero(im.any(axis=2))
+        if len(xs) == 0:
+            continue
+        # clipped to the image like the matplotlib axes
+        expected = np.clip(np.round(np.asarray(box[0:4]) * scale), 0,
+                           [shape[1] - 1, shape[0] - 1, shape[1] - 1, shape[0] - 1])
+        drawn = np.array([xs.min(), ys.min(), xs.max(), ys.max()])
+        tolerance = linewidth // 2 + 1
+        assert np.all(np.abs(drawn - expected) <= tolerance), (box, drawn)
+    assert len(texts) > 0, 'no labels to check'
+    for x, y, text, fontsize, colour in texts:
+        x, y = int(round(x * scale)), int(round(y * scale))
+        if not (2 <= x < shape[1] and 2 <= y < shape[0]):
+            continue
+        im = np.zeros(shape, dtype=np.uint8)
+        visualization.draw_cv(im, [], [(x / scale, y / scale, text, fontsize, colour if colour != 'k' else 'w')],
+                              scale)
+        ys, xs = np.nonzero(im.any(axis=2))
+        # the background of the label begins 2 pixels left of its position and ends 2 pixels below its baseline
+        (w, h), base = cv2.getTextSize(str(text), cv2.FONT_HERSHEY_SIMPLEX, fontsize / 30., 1)
+        assert xs.min() == x - 2 and ys.max() == min(y + base + 2, shape[0]) - 1, (text, x, y, xs.min(), ys.max())
+
+
+def best_time(func, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def render_matplotlib(rects, texts, im):
+    fig = visualization.draw_figure(im, rects, texts)
+    fig.savefig(io.BytesIO(), format='jpg')
+
+
+def render_cv(rects, texts, im):
+    out = visualization.draw_cv(im[:, :, ::-1].copy(), rects, texts)
+    cv2.imencode('.jpg', out)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    rects, texts = frame_items(args.objects)
+    im = (np.random.RandomState(0).rand(1080, 1920, 3) * 255).astype(np.uint8)
+    check_figure(rects, texts, im)
+    check_cv(rects, texts, im.shape)
+    check_cv(rects, texts, im.shape, scale=0.5)
+    print('Geometry of %d boxes and %d labels is the same in both backends' % (len(rects), len(texts)))
+    mpl_time = best_time(lambda: render_matplotlib(rects, texts, im), args.repeat)
+    cv_time = best_time(lambda: render_cv(rects, texts, im), args.repeat)
+    print('matplotlib %.1f ms/frame, opencv %.1f ms/frame (%.1fx)'
+          % (mpl_time * 1000., cv_time * 1000., mpl_time / cv_time))
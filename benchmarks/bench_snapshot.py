@@ -0,0 +1,81 @@
+"""
+Benchmark of saving and restoring the state of a tracker with libs/snapshot.py against pickle.
+Before timing, it checks that a tracker restored from a snapshot in the middle of a synthetic scene gives the
+same targets and IDs in the rest of the scene as the tracker that was not stopped, with per-target and
+batched filters.
+Run from the repository root:
+    python -m benchmarks.bench_snapshot
+"""
+from __future__ import print_function
+import time
+import pickle
+import argparse
+import numpy as np
+from libs import tracker
+from libs import snapshot
+from libs import kalman_tracker
+from benchmarks import synthetic
+
+
+def parse_args():
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description='SORT with occlusion handling snapshot benchmark')
+    parser.add_argument('--objects', dest='objects', help='Numbers of objects [10,100,500]', type=str,
+                        default='10,100,500')
+    parser.add_argument('--frames', dest='frames', help='Number of frames [40]', type=int, default=40)
+    parser.add_argument('--repeat', dest='repeat', help='Number of timed snapshots [20]', type=int, default=20)
+    args = parser.parse_args()
+    return args
+
+
+def new_tracker(batched):
+    kalman_tracker.KalmanBoxTracker.count = 0
+    mot_tracker = tracker.Sort_OH(batched=batched)
+    mot_tracker.seq = 'SYNTHETIC'
+    mot_tracker.conf_trgt = 0.35
+    mot_tracker.conf_objt = 0.75
+    return mot_tracker
+
+
+def track(mot_tracker, frames):
+    return [mot_tracker.update(dets, gts)[0] for frame, dets, gts, gt_ids in frames]
+
+
+def check_failover(frames, batched):
+    """
+    Tracks all frames, then tracks the first half, restores a snapshot and tracks the second half
+    """
+    expected = track(new_tracker(batched), frames)
+    half = len(frames) // 2
+    mot_tracker = new_tracker(batched)
+    track(mot_tracker, frames[:half])
+    data = snapshot.dumps(mot_tracker)
+    # a process that takes over begins with its own counter
+    kalman_tracker.KalmanBoxTracker.count = 0
+    restored = track(snapshot.loads(data), frames[half:])
+    for k, (res1, res2) in enumerate(zip(expected[half:], restored)):
+        assert np.array_equal(res1, res2), 'frame %d differs after restoring' % (half + k + 1)
+    return mot_tracker
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat * 1000., result
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    for num_objects in [int(n) for n in args.objects.split(',')]:
+        frames = synthetic.scene_frames(num_objects, args.frames, seed=num_objects)
+        for batched in (False, True):
+            mot_tracker = check_failover(frames, batched)
+            dump_time, data = timed(lambda: snapshot.dumps(mot_tracker), args.repeat)
+            load_time, _ = timed(lambda: snapshot.loads(data), args.repeat)
+            pdump_time, pdata = timed(lambda: pickle.dumps(mot_tracker, pickle.HIGHEST_PROTOCOL), args.repeat)
+            pload_time, _ = timed(lambda: pickle.loads(pdata), args.repeat)
+            print('%4d objects, %4d targets, %-10s snapshot %7d bytes, save %6.2f ms, restore %6.2f ms | '
+                  'pickle %7d bytes, save %6.2f ms, restore %6.2f ms'
+                  % (num_objects, len(mot_tracker.trackers), 'batched' if batched else 'per-target', len(data),
+                     dump_time, load_time, len(pdata), pdump_time, pload_time))
@@ -0,0 +1,84 @@
+"""
+Benchmark of the startup of a headless tracker process.
+Every measurement runs in a new Python process:
+  * import of libs.tracker, checking that the plotting stack (matplotlib, cv2, PIL), numba and filterpy are not
+    loaded by the import
+  * time to the first tracked frame (import, Sort_OH and update() of one frame) with per-target filters, which
+    import filterpy with the first target, and with the filter bank of batched mode, which does not
+  * calculate_cost.warm_up() with an empty numba cache, then with the cache written by the first run
+Run from the repository root:
+    python -m benchmarks.bench_startup
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+
+IMPORT = """
+import sys, time, json
+start = time.perf_counter()
+import libs.tracker
+print(json.dumps({'time': time.perf_counter() - start,
+                  'loaded': [m for m in ('matplotlib', 'cv2', 'PIL', 'libs.visualization', 'numba', 'filterpy')
+                             if m in sys.modules]}))
+"""
+
+FIRST_FRAME = """
+import time, json
+start = time.perf_counter()
+import numpy as np
+from libs import tracker
+mot_tracker = tracker.Sort_OH(batched=%s)
+mot_tracker.update(np.array([[10., 20., 60., 120., 0.9], [300., 200., 360., 330., 0.8]]), [])
+print(json.dumps({'time': time.perf_counter() - start}))
+"""
+
+WARM_UP = """
+import time, json
+from libs import calculate_cost
+start = time.perf_counter()
+calculate_cost.warm_up()
+print(json.dumps({'time': time.perf_counter() - start}))
+"""
+
+
+def parse_args():
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description='SORT with occlusion handling startup benchmark')
+    parser.add_argument('--repeat', dest='repeat', help='Number of processes of every measurement [5]', type=int,
+                        default=5)
+    args = parser.parse_args()
+    return args
+
+
+def run(code, env=None):
+    out = subprocess.check_output([sys.executable, '-c', code], env=env)
+    return json.loads(out.decode('utf-8').strip().splitlines()[-1])
+
+
+def median_time(code, repeat, env=None):
+    return np.median([run(code, env)['time'] for _ in range(repeat)]) * 1000.
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    loaded = run(IMPORT)['loaded']
+    assert len(loaded) == 0, 'importing libs.tracker loads %s' % ', '.join(loaded)
+    print('import libs.tracker: %.0f ms, plotting stack, numba and filterpy not loaded'
+          % median_time(IMPORT, args.repeat))
+    for batched in (False, True):
+        print('first tracked frame, %s: %.0f ms' % ('batched' if batched else 'per-target',
+                                                    median_time(FIRST_FRAME % batched, args.repeat)))
+
+    cache_dir = tempfile.mkdtemp()
+    env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+    cold = run(WARM_UP, env)['time'] * 1000.
+    cached = median_time(WARM_UP, args.repeat, env)
+    shutil.rmtree(cache_dir)
+    print('numba warm_up: %.0f ms compiling, %.0f ms from the cache (%.1fx)' % (cold, cached, cold / cached))
@@ -0,0 +1,174 @@
+"""
+Benchmark suite of the tracker hot path on synthetic crowds (see benchmarks/synthetic.py), no MOT data needed.
+For every crowd size it measures:
+  * Sort_OH.update throughput (frames per second) and peak memory over a synthetic sequence
+  * calculate_cost IoU and IoS matrices of detections and predicted targets in isolation
+  * gating.max_ios, the maximum IoS of every target without the IoS matrix, in isolation
+  * association.associate_detections_to_trackers in isolation
+Results can be saved as a baseline and later runs compared with it to detect regressions.
+Run from the repository root:
+    python -m benchmarks.bench_tracker --save benchmarks/baseline.json
+    python -m benchmarks.bench_tracker --compare benchmarks/baseline.json
+"""
+from __future__ import print_function
+import sys
+import copy
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+from libs import tracker
+from libs import association
+from libs import calculate_cost
+from libs import gating
+from libs import kalman_tracker
+from benchmarks import synthetic
+
+
+def parse_args():
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description='SORT with occlusion handling benchmark suite')
+    parser.add_argument('--sizes', dest='sizes', help='Numbers of objects [10,100,500,2000]',
+                        default='10,100,500,2000')
+    parser.add_argument('--frames', dest='frames', help='Frames of the tracker benchmark for 100 objects, '
+                        'scaled down for larger crowds [200]', type=int, default=200)
+    parser.add_argument('--batched', dest='batched', help='Use the batched Kalman filter bank [False]',
+                        action='store_true')
+    parser.add_argument('--gated', dest='gated', help='Use the sparse gated association [False]',
+                        action='store_true')
+    parser.add_argument('--save', dest='save', help='Save results as a baseline JSON file', default=None)
+    parser.add_argument('--compare', dest='compare', help='Compare results with a baseline JSON file', default=None)
+    parser.add_argument('--tolerance', dest='tolerance', help='Allowed slowdown or memory growth ratio [0.2]',
+                        type=float, default=0.2)
+    args = parser.parse_args()
+    return args
+
+
+def new_tracker(batched, gated=False):
+    kalman_tracker.KalmanBoxTracker.count = 0
+    mot_tracker = tracker.Sort_OH(batched=batched, gated=gated)
+    mot_tracker.seq = 'SYNTHETIC'
+    mot_tracker.conf_trgt = 0.35
+    mot_tracker.conf_objt = 0.75
+    return mot_tracker
+
+
+def best_time(func, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_tracker(frames, batched, gated):
+    """
+    Runs Sort_OH.update over all frames, returns throughput and peak traced memory
+    """
+    mot_tracker = new_tracker(batched, gated)
+    start = time.perf_counter()
+    for frame, dets, gts, gt_ids in frames:
+        mot_tracker.update(dets, gts)
+    elapsed = time.perf_counter() - start
+    # second pass only for memory, tracing slows down the tracker
+    mot_tracker = new_tracker(batched, gated)
+    tracemalloc.start()
+    for frame, dets, gts, gt_ids in frames:
+        mot_tracker.update(dets, gts)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'fps': len(frames) / elapsed, 'ms_per_frame': elapsed * 1000. / len(frames),
+            'peak_mb': peak / 1e6, 'tracks': len(mot_tracker.trackers)}
+
+
+def warm_tracker(frames, batched, gated):
+    """
+    Returns a tracker that has tracked frames[:-1] and the predicted targets for the last frame
+    """
+    mot_tracker = new_tracker(batched, gated)
+    for frame, dets, gts, gt_ids in frames[:-1]:
+        mot_tracker.update(dets, gts)
+    trks = np.zeros((len(mot_tracker.trackers), 5))
+    for t, trk in enumerate(mot_tracker.trackers):
+        trks[t, 0:4] = trk.get_state()[0]
+    return mot_tracker, trks
+
+
+def bench_stages(frames, batched, gated, repeat):
+    """
+    Times cost matrices and association of the last frame in isolation
+    """
+    mot_tracker, trks = warm_tracker(frames, batched, gated)
+    dets = frames[-1][1]
+    gts = frames[-1][2]
+    area_avg = np.mean((trks[:, 2] - trks[:, 0]) * (trks[:, 3] - trks[:, 1])) if len(trks) > 0 else 0
+    result = {'cal_iou_ms': best_time(lambda: calculate_cost.cal_iou(dets, trks), repeat) * 1000.,
+              'cal_ios_matrix_ms': best_time(lambda: calculate_cost.cal_ios_matrix(trks), repeat) * 1000.,
+              'max_ios_ms': best_time(lambda: gating.max_ios(trks), repeat) * 1000.}
+
+    # association changes the state of the tracker, so every repeat uses a fresh copy
+    best = np.inf
+    for _ in range(repeat):
+        mot_copy = copy.deepcopy(mot_tracker)
+        start = time.perf_counter()
+        association.associate_detections_to_trackers(mot_copy, dets, trks, gts, area_avg)
+        best = min(best, time.perf_counter() - start)
+    result['association_ms'] = best * 1000.
+    return result
+
+
+def run(sizes, frames_100, batched, gated=False):
+    results = {}
+    for n in sizes:
+        # keep the run time of large crowds reasonable
+        frames = max(10, int(frames_100 * min(1., 100. / n)))
+        scene = synthetic.scene_frames(n, frames, seed=n)
+        res = {'objects': n, 'frames': frames}
+        res.update(bench_tracker(scene, batched, gated))
+        res.update(bench_stages(scene, batched, gated, repeat=3 if n >= 500 else 10))
+        results[str(n)] = res
+        print('%5d objects, %4d frames: %8.1f FPS %9.2f ms/frame %8.2f MB peak | cal_iou %8.3f ms, '
+              'cal_ios_matrix %8.3f ms, max_ios %8.3f ms, association %8.3f ms'
+              % (n, frames, res['fps'], res['ms_per_frame'], res['peak_mb'], res['cal_iou_ms'],
+                 res['cal_ios_matrix_ms'], res['max_ios_ms'], res['association_ms']))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns lines describing results that are slower or use more memory than baseline by more than tolerance
+    """
+    regressions = []
+    for n, res in results.items():
+        if n not in baseline:
+            continue
+        for name in ('ms_per_frame', 'peak_mb', 'cal_iou_ms', 'cal_ios_matrix_ms', 'max_ios_ms', 'association_ms'):
+            # baselines saved by older versions do not have every measurement
+            if name not in baseline[n]:
+                continue
+            old = baseline[n][name]
+            # differences below 0.05 ms or MB are measurement noise
+            if old > 0 and res[name] > old * (1 + tolerance) and res[name] - old > 0.05:
+                regressions.append('%s objects: %s %.3f -> %.3f (+%.0f%%)'
+                                   % (n, name, old, res[name], (res[name] / old - 1) * 100))
+    return regressions
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    results = run([int(n) for n in args.sizes.split(',')], args.frames, args.batched, args.gated)
+    if args.save is not None:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print('Baseline saved to %s' % args.save)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print('REGRESSION ' + line)
+        if len(regressions) > 0:
+            sys.exit(1)
+        print('No regression compared with %s' % args.compare)
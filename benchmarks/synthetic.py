@@ -0,0 +1,64 @@
+"""
+Synthetic crowd scenes for benchmarks, so the tracker can be measured without the MOT data.
+Objects move linearly (bouncing off the image borders), occlude each other and are detected with noise,
+misses and false positives.
+"""
+import numpy as np
+from libs import calculate_cost
+
+
+def crowd_scene(num_objects, frames, miss_rate=0.1, fp_rate=0.05, occlusion=0.6, scene=(1920, 1080), seed=0):
+    """
+    Generates frames of a synthetic crowd
+    Params:
+      num_objects - number of objects in the scene
+      frames - number of frames
+      miss_rate - probability that a visible object is not detected
+      fp_rate - mean number of false positive detections per frame, relative to num_objects
+      occlusion - an object is not detected when this ratio of it is covered by objects in front of it
+      scene - width and height of the image, objects stay inside it
+    Yields (frame, dets, gts, gt_ids) for every frame, frame numbers begin at 1
+      dets - detections in the format [[x1,y1,x2,y2,score],...]
+      gts - ground truths in the same format with score 1, gt_ids their IDs
+    """
+    rng = np.random.RandomState(seed)
+    scene = np.asarray(scene, dtype=np.float64)
+    # box size shrinks with the number of objects, so crowds of any size fit in the scene
+    scale = np.sqrt(50. / max(num_objects, 50))
+    size = np.stack((rng.uniform(40, 80, num_objects), rng.uniform(100, 200, num_objects)), axis=1) * scale
+    pos = rng.rand(num_objects, 2) * (scene - size)
+    vel = rng.randn(num_objects, 2) * [4., 1.] * scale
+    ids = np.arange(1, num_objects + 1)
+    for frame in range(1, frames + 1):
+        pos += vel
+        # bounce off the borders
+        low = pos < 0
+        high = pos + size > scene
+        vel[low | high] *= -1
+        pos = np.clip(pos, 0, scene - size)
+        gts = np.concatenate((pos, pos + size, np.ones((num_objects, 1))), axis=1)
+
+        # objects with larger bottom are nearer to the camera and occlude the others
+        covered = calculate_cost.ios_matrix(gts, gts)   # [i, j]: ratio of j covered by i
+        np.fill_diagonal(covered, 0)
+        in_front = gts[:, 3][:, None] > gts[:, 3][None, :]
+        visible = np.max(np.where(in_front, covered, 0), axis=0, initial=0) < occlusion
+        detected = visible & (rng.rand(num_objects) >= miss_rate)
+
+        boxes = gts[detected, 0:4] + rng.randn(int(detected.sum()), 4) * 2 * scale
+        scores = rng.uniform(0.5, 1.0, (len(boxes), 1))
+        num_fp = rng.poisson(fp_rate * num_objects)
+        fp_pos = rng.rand(num_fp, 2) * (scene - 200 * scale)
+        fp_boxes = np.concatenate((fp_pos, fp_pos + rng.uniform(30, 200, (num_fp, 2)) * scale), axis=1)
+        fp_scores = rng.uniform(0.3, 0.7, (num_fp, 1))
+        dets = np.concatenate((np.concatenate((boxes, scores), axis=1),
+                               np.concatenate((fp_boxes, fp_scores), axis=1)))
+        dets = dets[rng.permutation(len(dets))]
+        yield frame, dets, gts, ids
+
+
+def scene_frames(num_objects, frames, **kwargs):
+    """
+    Returns the frames of crowd_scene() as a list, so generation is not part of a measurement
+    """
+    return list(crowd_scene(num_objects, frames, **kwargs))
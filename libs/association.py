@@ -1,153 +1,238 @@
 import numpy as np
 from scipy.optimize import linear_sum_assignment
 from . import calculate_cost
-from . import visualization
+from . import gating
 
 
-def associate_detections_to_trackers(mot_tracker, detections, trackers, groundtruths, average_area, iou_threshold=0.3):
+class Assignment(object):
+    """
+  Result of the association of a frame. The tracker keeps one Assignment and it is filled again in every frame:
+  its arrays are views of buffers that only grow when a frame has more detections or targets than before.
+    det_trk - (D,) index of the target matched to every detection, -1 if it is not matched
+    trk_det - (T,) index of the detection matched to every target, -1 if it is not matched
+    occluded - (T,) mask of unmatched targets that are occluded
+    unmatched_dets - indexes of unmatched detections, in the order new targets are created from them
+    unmatched_trks - indexes of unmatched targets that are not occluded
+    unmatched_gts - indexes of ground truths that are not covered by a found target (only with gt_diff)
+    det_free, trk_free - masks of detections and targets used to find the unmatched ones
+  """
+    def __init__(self, capacity=64):
+        self.det_buf = np.empty(capacity, dtype=int)
+        self.det_free_buf = np.empty(capacity, dtype=bool)
+        self.unmatched_det_buf = np.empty(capacity, dtype=int)
+        self.trk_buf = np.empty(capacity, dtype=int)
+        self.trk_free_buf = np.empty(capacity, dtype=bool)
+        self.unmatched_trk_buf = np.empty(capacity, dtype=int)
+        self.occluded_buf = np.empty(capacity, dtype=bool)
+        self.index = np.arange(capacity)
+        self.reset(0, 0)
+
+    def reset(self, num_dets, num_trks):
+        """
+    Starts the assignment of a frame with num_dets detections and num_trks targets, nothing is matched
+    """
+        if num_dets > len(self.det_buf):
+            self.det_buf = np.empty(max(num_dets, 2 * len(self.det_buf)), dtype=int)
+            self.det_free_buf = np.empty(len(self.det_buf), dtype=bool)
+            self.unmatched_det_buf = np.empty(len(self.det_buf), dtype=int)
+        if num_trks > len(self.trk_buf):
+            self.trk_buf = np.empty(max(num_trks, 2 * len(self.trk_buf)), dtype=int)
+            self.trk_free_buf = np.empty(len(self.trk_buf), dtype=bool)
+            self.unmatched_trk_buf = np.empty(len(self.trk_buf), dtype=int)
+            self.occluded_buf = np.empty(len(self.trk_buf), dtype=bool)
+        if max(num_dets, num_trks) > len(self.index):
+            self.index = np.arange(max(len(self.det_buf), len(self.trk_buf)))
+        self.det_trk = self.det_buf[:num_dets]
+        self.det_trk.fill(-1)
+        self.det_free = self.det_free_buf[:num_dets]
+        self.trk_det = self.trk_buf[:num_trks]
+        self.trk_det.fill(-1)
+        self.trk_free = self.trk_free_buf[:num_trks]
+        self.occluded = self.occluded_buf[:num_trks]
+        self.occluded.fill(False)
+        self.unmatched_dets = self.index[:num_dets]
+        self.unmatched_trks = self.unmatched_trk_buf[:0]
+        self.unmatched_gts = np.empty(0, dtype=int)
+
+    def match(self, det_ind, trk_ind):
+        """
+    Matches the detections det_ind to the targets trk_ind
+    """
+        self.det_trk[det_ind] = trk_ind
+        self.trk_det[trk_ind] = det_ind
+
+    def collect_unmatched(self, dets_last=None, trks_last=None):
+        """
+    Sets unmatched_dets and unmatched_trks to the detections and targets that are not matched, in ascending order,
+    except unmatched indexes in dets_last and trks_last, which follow the others in their order
+    """
+        self.unmatched_dets = self.unmatched(self.det_trk, self.det_free, self.unmatched_det_buf, dets_last)
+        self.unmatched_trks = self.unmatched(self.trk_det, self.trk_free, self.unmatched_trk_buf, trks_last)
+
+    def unmatched(self, matched, free, buf, last):
+        """
+    Writes the indexes of the -1 entries of matched to buf, the ones in last at the end, and returns them
+    """
+        np.less(matched, 0, out=free)
+        num_last = 0
+        if last is not None:
+            free[last] = False
+            num_last = len(last)
+        num = np.count_nonzero(free)
+        result = buf[:num + num_last]
+        np.compress(free, self.index[:len(free)], out=result[:num])
+        if num_last > 0:
+            result[num:] = last
+        return result
+
+    def remove_unmatched(self, det_pos, trk_pos):
+        """
+    Removes the entries at positions det_pos of unmatched_dets and trk_pos of unmatched_trks after they are
+    matched, the order of the others is kept
+    """
+        self.unmatched_dets = self.remove(self.unmatched_dets, self.det_free_buf, det_pos)
+        self.unmatched_trks = self.remove(self.unmatched_trks, self.trk_free_buf, trk_pos)
+
+    @staticmethod
+    def remove(unmatched, keep_buf, pos):
+        """
+    Removes the entries at positions pos of unmatched in place, keep_buf is the buffer of the mask of kept entries
+    """
+        keep = keep_buf[:len(unmatched)]
+        keep.fill(True)
+        keep[pos] = False
+        result = unmatched[:len(unmatched) - len(pos)]
+        np.compress(keep, unmatched, out=result)
+        return result
+
+
+def associate_detections_to_trackers(mot_tracker, detections, trackers, groundtruths, average_area, iou_threshold=0.3,
+                                     ios_threshold=0.3, iou_matrix=None, gt_diff=False):
     """
   Assigns detections to tracked object (both represented as bounding boxes)
-  Returns 5 lists of matches, unmatched_detections, unmatched_trackers, occluded_trackers and unmatched ground truths
+  iou_matrix is the IoU of detections and trackers if it is already computed, it is not used in gated mode
+  If gt_diff is True, ground truths that are not covered by a found target are found, too (for display)
+  Returns the Assignment of mot_tracker, filled with matched, unmatched and occluded targets and
+  unmatched detections and ground truths of the frame
   """
+    assignment = mot_tracker.assignment
+    assignment.reset(len(detections), len(trackers))
     if len(trackers) == 0 or len(detections) == 0:
-        return np.empty((0, 2), dtype=int), np.arange(len(detections)), np.empty((0, 1), dtype=int), np.empty((0, 1), dtype=int), np.empty((0, 1), dtype=int)
+        return assignment
+
+    prof = mot_tracker.profiler
+    if prof is not None:
+        t_prof = prof.tic()
 
     # assign only according to iou
     # calculate intersection over union cost
-    iou_matrix = calculate_cost.cal_iou(detections, trackers)
-    ios_matrix = calculate_cost.cal_ios_matrix(trackers)
+    if mot_tracker.gated:
+        # IoU is computed only for pairs in the same cells of a grid and every connected component of
+        # overlapping pairs is assigned separately. It gives the same matches as the dense assignment.
+        det_ind, trk_ind, ious = gating.sparse_iou(detections, trackers)
+        if prof is not None:
+            t_prof = prof.lap('cost_matrix', t_prof)
+        matched_indices, matched_ious = gating.gated_assignment(len(detections), len(trackers), det_ind, trk_ind, ious)
+    else:
+        if iou_matrix is None:
+            iou_matrix = calculate_cost.cal_iou(detections, trackers)
+        if prof is not None:
+            t_prof = prof.lap('cost_matrix', t_prof)
 
-    matched_indices = linear_sum_assignment(-iou_matrix)
-    matched_indices = np.asarray(matched_indices)
-    matched_indices = np.transpose(matched_indices)     # first column: detection indexes, second column: object indexes
+        matched_indices = linear_sum_assignment(-iou_matrix)
+        matched_indices = np.asarray(matched_indices)
+        matched_indices = np.transpose(matched_indices)     # first column: detection indexes, second column: object indexes
+        matched_ious = iou_matrix[matched_indices[:, 0], matched_indices[:, 1]]
 
-    unmatched_detections = []
-    for d, det in enumerate(detections):
-        if d not in matched_indices[:, 0]:
-            unmatched_detections.append(d)
+    # filter out matched with low IOU
+    keep = matched_ious >= iou_threshold
+    matches = matched_indices[keep]
+    assignment.match(matches[:, 0], matches[:, 1])
+    mot_tracker.trackers.rec['time_since_observed'][matches[:, 1]] = 0
+    if mot_tracker.gated:
+        # unmatched are in ascending order, pairs with low IOU are not told apart
+        assignment.collect_unmatched()
+    else:
+        # unmatched are the ones without an assigned pair, followed by the ones of pairs with low IOU
+        rejected = matched_indices[~keep]
+        assignment.collect_unmatched(rejected[:, 0], rejected[:, 1])
+    unmatched_detections = assignment.unmatched_dets
+    unmatched_trackers = assignment.unmatched_trks
+    if prof is not None:
+        t_prof = prof.lap('hungarian', t_prof)
 
-    unmatched_trackers = []
-    for t, trk in enumerate(trackers):
-        if t not in matched_indices[:, 1]:
-            unmatched_trackers.append(t)
+    # try to match extended unmatched tracks to unmatched detections
+    # unmatched detections of the previous frame are the last detections of the chains of new targets
+    if len(matches) > 0 and len(unmatched_detections) > 0 and len(unmatched_trackers) > 0 and \
+            len(mot_tracker.birth) > 0:
+        iou_matrix = calculate_cost.cal_iou(detections[unmatched_detections], mot_tracker.birth.boxes)
+        matched_indices = linear_sum_assignment(-iou_matrix)
+        # chain of the previous frame matched to every unmatched detection, -1 if not matched
+        before = np.full(len(unmatched_detections), -1)
+        before[matched_indices[0]] = matched_indices[1]
 
-    # filter out matched with low IOU
-    matches = []
-    for m in matched_indices:
-        if iou_matrix[m[0], m[1]] < iou_threshold:
-            unmatched_detections.append(m[0])
-            unmatched_trackers.append(m[1])
-        else:
-            matches.append(m.reshape(1, 2))
-            mot_tracker.trackers[m[1]].time_since_observed = 0
+        # extension coefficients grow with the number of frames each target is unobserved
+        ext_w, ext_h = calculate_cost.ext_factors(mot_tracker.trackers.rec['time_since_observed'][unmatched_trackers])
+        # first index: unmatched trackers, second index: unmatched detections
+        iou_matrix_ext = calculate_cost.cal_iou_ext_sep(detections[unmatched_detections],
+                                                        trackers[unmatched_trackers], ext_w, ext_h).T
+        ext_trk, ext_det = linear_sum_assignment(-iou_matrix_ext)
 
-    unmatched_detections = np.array(unmatched_detections)
-    unmatched_trackers = np.array(unmatched_trackers)
-    if len(matches) == 0:
-        matches = np.empty((0, 2), dtype=int)
-    else:
-        matches = np.concatenate(matches, axis=0)
+        # filter out matched with low IOU and low area
+        ext_before = before[ext_det]
+        valid = ext_before >= 0
+        valid[valid] = (iou_matrix_ext[ext_trk[valid], ext_det[valid]] >= iou_threshold) & \
+                       (iou_matrix[ext_det[valid], ext_before[valid]] >= iou_threshold)
+        ext_trk, ext_det, ext_before = ext_trk[valid], ext_det[valid], ext_before[valid]
+        assignment.match(unmatched_detections[ext_det], unmatched_trackers[ext_trk])
+        # remove matched detections from unmatched arrays
+        assignment.remove_unmatched(ext_det, ext_trk)
+        unmatched_detections = assignment.unmatched_dets
+        unmatched_trackers = assignment.unmatched_trks
+        if len(ext_before) > 0:
+            mot_tracker.birth.remove(ext_before)
+
+    if prof is not None:
+        t_prof = prof.lap('extended', t_prof)
 
-        # try to match extended unmatched tracks to unmatched detections
-        if len(unmatched_detections) > 0 and len(unmatched_trackers) > 0 and len(mot_tracker.unmatched_before) > 0:
-            unm_dets = []
-            for ud in unmatched_detections:
-                unm_dets.append(detections[ud])
-            iou_matrix = calculate_cost.cal_iou(unm_dets, mot_tracker.unmatched_before)
-            matched_indices = linear_sum_assignment(-iou_matrix)
-            matched_indices = np.asarray(matched_indices)
-            matched_indices = np.transpose(matched_indices)
-
-            iou_matrix_ext = np.zeros((len(unmatched_trackers), len(unmatched_detections)), dtype=np.float32)
-            for ud in range(len(unmatched_detections)):
-                for ut in range(len(unmatched_trackers)):
-                    iou_matrix_ext[ut, ud] = calculate_cost.iou_ext_sep(detections[unmatched_detections[ud]],
-                                                                        trackers[unmatched_trackers[ut]],
-                                                                        np.minimum(1.2, (mot_tracker.trackers[
-                                                                                             unmatched_trackers[
-                                                                                                 ut]].time_since_observed + 1) * 0.3),
-                                                                        np.minimum(0.5, (mot_tracker.trackers[
-                                                                                             unmatched_trackers[
-                                                                                                 ut]].time_since_observed + 1) * 0.1))
-            matched_indices_ext = linear_sum_assignment(-iou_matrix_ext)
-            matched_indices_ext = np.asarray(matched_indices_ext)
-            matched_indices_ext = np.transpose(matched_indices_ext)
-
-            # filter out matched with low IOU and low area
-            matches_ext_com = []
-            del_ind = np.empty((0, 3), dtype=int)
-            for m in matched_indices_ext:
-                ind = matched_indices[np.where(matched_indices[:, 0] == m[1]), 1]
-                if ind.size:
-                    if (iou_matrix_ext[m[0], m[1]] >= iou_threshold) and (iou_matrix[m[1], ind] >= iou_threshold):
-                        matches_ext_com.append(np.concatenate((m.reshape(1, 2), ind), axis=1))
-                        # remove matched detections from unmatched arrays
-                        del_ind = np.concatenate((del_ind, np.array([m[0], m[1], ind.item(0)]).reshape(1, 3)))
-
-            to_del_und = []
-            to_del_unt = []
-            to_del_undb = []
-            matches_ext = np.empty((0, 2), dtype=int)
-            if len(matches_ext_com) > 0:
-                matches_ext_com = np.concatenate(matches_ext_com, axis=0)
-                for m in matches_ext_com:
-                    new = np.array([[unmatched_detections[m[1]], unmatched_trackers[m[0]]]])
-                    matches_ext = np.append(matches_ext, new, axis=0)
-                    to_del_unt.append(m[0])
-                    to_del_und.append(m[1])
-                    to_del_undb.append(m[2])
-            matches = np.concatenate((matches, matches_ext))
-            if len(to_del_unt) > 0:
-                to_del_unt = np.array(to_del_unt)
-                to_del_unt = np.sort(to_del_unt)
-                for i in reversed(to_del_unt):
-                    unmatched_trackers = np.delete(unmatched_trackers, i, 0)
-            if len(to_del_und) > 0:
-                to_del_und = np.array(to_del_und)
-                to_del_und = np.sort(to_del_und)
-                for i in reversed(to_del_und):
-                    unmatched_detections = np.delete(unmatched_detections, i, 0)
-            if len(to_del_undb) > 0:
-                to_del_undb = np.array(to_del_undb)
-                to_del_undb = np.sort(to_del_undb)
-                for i in reversed(to_del_undb):
-                    mot_tracker.unmatched_before.pop(i)
-
-    occluded_trackers = []
     if mot_tracker.frame_count > mot_tracker.min_hits:
-        trks_occlusion = np.amax(ios_matrix, axis=0)
+        # the largest ratio of every target covered by another target, only overlapping targets are compared
+        trks_occlusion = gating.max_ios(trackers)
+        if prof is not None:
+            t_prof = prof.lap('ios_matrix', t_prof)
+        # confidence of all unmatched targets from the columns of the track table
         unm_trks = unmatched_trackers
-        unmatched_trackers = []
-        for ut in unm_trks:
-            ut_area = (trackers[ut, 3] - trackers[ut, 1])*(trackers[ut, 2] - trackers[ut, 0])
-            mot_tracker.trackers[ut].time_since_observed += 1
-            mot_tracker.trackers[ut].confidence = min(1, mot_tracker.trackers[ut].age/(mot_tracker.trackers[ut].time_since_observed*10)*(ut_area/average_area))
-            if trks_occlusion[ut] > 0.3 and mot_tracker.trackers[ut].confidence > mot_tracker.conf_trgt:
-            # if trks_occlusion[ut] > 0.3 and ut_area > 0.7 * average_area and mot_tracker.trackers[ut].age > 5:
-                occluded_trackers.append(ut)
-            elif mot_tracker.trackers[ut].confidence > mot_tracker.conf_objt:
-            # elif mot_tracker.trackers[ut].age > (mot_tracker.trackers[ut].time_since_observed * 10 + 10) and mot_tracker.trackers[ut].time_since_observed < 5:
-                occluded_trackers.append(ut)
-            else:
-                unmatched_trackers.append(ut)
+        rec = mot_tracker.trackers.rec
+        ut_area = (trackers[unm_trks, 3] - trackers[unm_trks, 1])*(trackers[unm_trks, 2] - trackers[unm_trks, 0])
+        rec['time_since_observed'][unm_trks] += 1
+        confidence = rec['age'][unm_trks]/(rec['time_since_observed'][unm_trks]*10)*(ut_area/average_area)
+        confidence = np.where(confidence < 1, confidence, 1)
+        rec['confidence'][unm_trks] = confidence
+        # if trks_occlusion[ut] > 0.3 and ut_area > 0.7 * average_area and mot_tracker.trackers[ut].age > 5:
+        # elif mot_tracker.trackers[ut].age > (mot_tracker.trackers[ut].time_since_observed * 10 + 10) and mot_tracker.trackers[ut].time_since_observed < 5:
+        occluded = ((trks_occlusion[unm_trks] > ios_threshold) & (confidence > mot_tracker.conf_trgt)) | \
+                   (confidence > mot_tracker.conf_objt)
+        assignment.occluded[unm_trks[occluded]] = True
+        unmatched_trackers = unm_trks[~occluded]
+    assignment.unmatched_dets = unmatched_detections
+    assignment.unmatched_trks = unmatched_trackers
+
+    if prof is not None:
+        t_prof = prof.lap('occlusion', t_prof)
 
     # find unmatched ground truths
-    unmatched_groundtruths = []
-    if visualization.DisplayState.display_gt_diff:
-        found_trackers = trackers
-        for i in reversed(np.sort(unmatched_trackers)):
-            found_trackers = np.delete(found_trackers, i, 0)
-        iou_matrix_1 = calculate_cost.cal_iou(groundtruths, found_trackers)
-        # first column: ground truth indexes, second column: object indexes
-        matched_indices_1 = linear_sum_assignment(-iou_matrix_1)
-        matched_indices_1 = np.asarray(matched_indices_1)
-        matched_indices_1 = np.transpose(matched_indices_1)
-
-        for g, gt in enumerate(groundtruths):
-            if g not in matched_indices_1[:, 0]:
-                unmatched_groundtruths.append(g)
-
-    return matches, unmatched_detections, unmatched_trackers, np.array(occluded_trackers), np.array(unmatched_groundtruths)
+    if gt_diff:
+        found_trackers = np.ones(len(trackers), dtype=bool)
+        found_trackers[unmatched_trackers] = False
+        iou_matrix_1 = calculate_cost.cal_iou(groundtruths, trackers[found_trackers])
+        # ground truths matched to a found target
+        matched_gts = np.zeros(len(groundtruths), dtype=bool)
+        matched_gts[linear_sum_assignment(-iou_matrix_1)[0]] = True
+        assignment.unmatched_gts = np.flatnonzero(~matched_gts)
+    if prof is not None:
+        prof.lap('gt_diff', t_prof)
+
+    return assignment
 
 
 def find_new_trackers(detections, detections_before, iou_threshold=0.3):
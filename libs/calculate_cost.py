@@ -1,8 +1,24 @@
-from numba import jit
+import functools
 import numpy as np
 
 
-@jit
+def lazy_jit(func):
+    """
+    Decorates a kernel that is compiled by numba at its first call and cached on disk (__pycache__, or
+    NUMBA_CACHE_DIR), so numba is imported only when a kernel is used, not when the module is imported
+    """
+    compiled = []
+
+    @functools.wraps(func)
+    def kernel(*args):
+        if len(compiled) == 0:
+            from numba import jit
+            compiled.append(jit(cache=True)(func))
+        return compiled[0](*args)
+    return kernel
+
+
+@lazy_jit
 def iou(bb_det, bb_trk):
     """
   Computes IOU (Intersection Over Union) between two bounding boxes in the form [x1,y1,x2,y2]
@@ -72,7 +88,7 @@ def iou_ext_sep(bb_det, bb_trk, ext_w, ext_h):
     return o
 
 
-@jit
+@lazy_jit
 def outside(trk, img_s):
     """
     Computes how many percent of trk is placed outside of img_s
@@ -92,7 +108,7 @@ def outside(trk, img_s):
     return out_a / area
 
 
-@jit
+@lazy_jit
 def area_cost(bb_det, bb_trk):
     """
     This cost compute the difference between bounding box sizes
@@ -124,7 +140,7 @@ def area_cost(bb_det, bb_trk):
     return ratio - 1
 
 
-@jit
+@lazy_jit
 # intersection over union with limit on area
 def iou_la(bb_det, bb_trk):
     """
@@ -153,7 +169,7 @@ def iou_la(bb_det, bb_trk):
     return o
 
 
-@jit
+@lazy_jit
 def ios(bb_first, bb_second):
     """
   Computes IOS (Intersection Over Second Bounding Box) between two bounding boxes in the form [x1,y1,x2,y2]
@@ -169,44 +185,155 @@ def ios(bb_first, bb_second):
     return o
 
 
+def warm_up():
+    """
+    Imports numba and compiles the kernels of this module for float boxes, or loads them from the on-disk cache
+    that an earlier process wrote, so their first call does not pay for compilation. The tracker itself uses the
+    NumPy matrix kernels, so it does not need it.
+    """
+    box_a = np.array([10., 20., 60., 120., 1.])
+    box_b = np.array([30., 40., 90., 150., 1.])
+    iou(box_a, box_b)
+    iou_la(box_a, box_b)
+    ios(box_a, box_b)
+    area_cost(box_a, box_b)
+    outside(box_a, np.array([1920, 1080]))
+
+
+def as_boxes(boxes):
+    """
+    Converts a list or an array of bounding boxes to a float (N,K) array, also when it is empty
+    """
+    boxes = np.asarray(boxes, dtype=np.float64)
+    if boxes.size == 0:
+        return np.zeros((0, 4))
+    return boxes.reshape(len(boxes), -1)
+
+
+def iou_matrix(bbs_det, bbs_trk):
+    """
+  Computes IOU between every pair of (N,4) and (M,4) bounding boxes in the form [x1,y1,x2,y2] by broadcasting
+  Stacks of (S,N,4) and (S,M,4) bounding boxes give (S,N,M) matrices
+  Returns (N,M) float64 matrix, equal to calling iou() for every pair
+  """
+    det = bbs_det[..., :, None, :]
+    trk = bbs_trk[..., None, :, :]
+    w = np.maximum(0., np.minimum(det[..., 2], trk[..., 2]) - np.maximum(det[..., 0], trk[..., 0]))
+    h = np.maximum(0., np.minimum(det[..., 3], trk[..., 3]) - np.maximum(det[..., 1], trk[..., 1]))
+    wh = w * h
+    area_det = (det[..., 2] - det[..., 0]) * (det[..., 3] - det[..., 1])
+    area_trk = (trk[..., 2] - trk[..., 0]) * (trk[..., 3] - trk[..., 1])
+    o = np.zeros(wh.shape)
+    overlap = (w != 0) & (h != 0)
+    np.divide(wh, area_det + area_trk - wh, out=o, where=overlap)
+    return o
+
+
+def ios_matrix(bbs_first, bbs_second):
+    """
+  Computes IOS between every pair of (N,4) and (M,4) bounding boxes in the form [x1,y1,x2,y2] by broadcasting
+  Returns (N,M) float64 matrix, equal to calling ios() for every pair
+  """
+    first = bbs_first[:, None, :]
+    second = bbs_second[None, :, :]
+    w = np.maximum(0., np.minimum(first[..., 2], second[..., 2]) - np.maximum(first[..., 0], second[..., 0]))
+    h = np.maximum(0., np.minimum(first[..., 3], second[..., 3]) - np.maximum(first[..., 1], second[..., 1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (w * h) / ((second[..., 2] - second[..., 0]) * (second[..., 3] - second[..., 1]))
+
+
+def ext_factors(time_since_observed):
+    """
+    Computes width and height extension coefficients of occluded targets from the number of frames they are unobserved
+    Accepts a scalar or a vector and returns (ext_w, ext_h) of the same shape
+    """
+    tso = np.asarray(time_since_observed)
+    return np.minimum(1.2, (tso + 1) * 0.3), np.minimum(0.5, (tso + 1) * 0.1)
+
+
+def iou_ext_sep_matrix(bbs_det, bbs_trk, ext_w, ext_h):
+    """
+    Computes extended IOU between every pair of (N,4) detections and (M,4) targets in the form [x1,y1,x2,y2]
+    ext_w and ext_h are (M,) vectors of separate extension coefficients of every target
+    Returns (N,M) float64 matrix, equal to calling iou_ext_sep() for every pair
+    """
+    det = bbs_det[:, None, :]
+    trk = bbs_trk[None, :, :]
+    trk_w = trk[..., 2] - trk[..., 0]
+    trk_h = trk[..., 3] - trk[..., 1]
+    ext_w = np.asarray(ext_w, dtype=np.float64)[None, :]
+    ext_h = np.asarray(ext_h, dtype=np.float64)[None, :]
+    w = np.maximum(0., np.minimum(det[..., 2], trk[..., 2] + trk_w*ext_w/2) -
+                   np.maximum(det[..., 0], trk[..., 0] - trk_w*ext_w/2))
+    h = np.maximum(0., np.minimum(det[..., 3], trk[..., 3] + trk_h*ext_h/2) -
+                   np.maximum(det[..., 1], trk[..., 1] - trk_h*ext_h/2))
+    wh = w * h
+    area_det = (det[..., 2] - det[..., 0]) * (det[..., 3] - det[..., 1])
+    area_trk = trk_w * trk_h
+    o = np.zeros(wh.shape)
+    overlap = (w != 0) & (h != 0)
+    np.divide(wh, area_det + area_trk - wh, out=o, where=overlap)
+    return o
+
+
+def area_cost_matrix(bbs_det, bbs_trk):
+    """
+    Computes area_cost() between every pair of (N,4) and (M,4) bounding boxes by broadcasting
+    Returns (N,M) float64 matrix
+    """
+    w_d = (bbs_det[:, 2] - bbs_det[:, 0])[:, None]
+    w_t = (bbs_trk[:, 2] - bbs_trk[:, 0])[None, :]
+    h_d = (bbs_det[:, 3] - bbs_det[:, 1])[:, None]
+    h_t = (bbs_trk[:, 3] - bbs_trk[:, 1])[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w_ratio = np.where(w_d > w_t, w_d / w_t, w_t / w_d)
+        h_ratio = np.where(h_d > h_t, h_d / h_t, h_t / h_d)
+    return w_ratio * h_ratio - 1
+
+
+def outside_vector(trks, img_s):
+    """
+    Computes outside() for every one of (N,4) bounding boxes
+    Returns (N,) float64 vector
+    """
+    out_x = np.where(trks[:, 2] > img_s[0], trks[:, 2] - img_s[0], np.where(trks[:, 0] < 0, -trks[:, 0], 0.))
+    out_y = np.where(trks[:, 3] > img_s[1], trks[:, 3] - img_s[1], np.where(trks[:, 1] < 0, -trks[:, 1], 0.))
+    out_a = out_x * (trks[:, 3] - trks[:, 1]) + out_y * (trks[:, 2] - trks[:, 0])
+    area = (trks[:, 3] - trks[:, 1]) * (trks[:, 2] - trks[:, 0])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return out_a / area
+
+
 def cal_iou(detections, trackers):
-    iou_matrix = np.zeros((len(detections), len(trackers)), dtype=np.float32)
-    for d, det in enumerate(detections):
-        for t, trk in enumerate(trackers):
-            iou_matrix[d, t] = iou(det, trk)
-    return iou_matrix
+    detections = as_boxes(detections)
+    trackers = as_boxes(trackers)
+    return iou_matrix(detections, trackers).astype(np.float32)
+
+
+def cal_iou_ext_sep(detections, trackers, ext_w, ext_h):
+    detections = as_boxes(detections)
+    trackers = as_boxes(trackers)
+    return iou_ext_sep_matrix(detections, trackers, ext_w, ext_h).astype(np.float32)
 
 
 def cal_area_cost(detections, trackers):
     if len(detections) == 0 or len(trackers) == 0:
         return np.empty((len(detections), len(trackers)), dtype=int)
-    area_cost_matrix = np.zeros((len(detections), len(trackers)), dtype=np.float32)
-    for d, det in enumerate(detections):
-        for t, trk in enumerate(trackers):
-            area_cost_matrix[d, t] = area_cost(det, trk)
-    return area_cost_matrix
+    return area_cost_matrix(as_boxes(detections), as_boxes(trackers)).astype(np.float32)
 
 
 def cal_ios(detections, tracker):
-    ios_matrix = np.zeros((len(detections), 1), dtype=np.float32)
-    for d, det in enumerate(detections):
-        ios_matrix[d, 0] = ios(det, tracker)
-    return ios_matrix
+    detections = as_boxes(detections)
+    tracker = as_boxes([tracker])
+    return ios_matrix(detections, tracker).astype(np.float32)
 
 
 def cal_outside(trackers, img_s):
-    out = np.zeros(len(trackers), dtype=np.float32)
-    for t, trk in enumerate(trackers):
-        out[t] = outside(trk, img_s)
-    return out
+    return outside_vector(as_boxes(trackers), img_s).astype(np.float32)
 
 
 def cal_ios_matrix(trackers):
-    ios_matrix = np.zeros((len(trackers), len(trackers)), dtype=np.float32)
-    for t1, trk1 in enumerate(trackers):
-        for t2, trk2 in enumerate(trackers):
-            if t2 != t1:
-                ios_matrix[t1, t2] = ios(trk1, trk2)
-    return ios_matrix
-
-
+    trackers = as_boxes(trackers)
+    ios_mat = ios_matrix(trackers, trackers).astype(np.float32)
+    np.fill_diagonal(ios_mat, 0)
+    return ios_mat
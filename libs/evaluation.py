@@ -0,0 +1,166 @@
+from collections import Counter
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from . import calculate_cost
+
+
+# raw counts of an evaluator, they can be summed over sequences
+count_names = ['frames', 'num_gt', 'num_trk', 'tp', 'fp', 'fn', 'idsw', 'frag', 'iou_sum',
+               'idtp', 'idfp', 'idfn', 'num_objects', 'mt', 'pt', 'ml']
+
+
+class MOTEvaluator(object):
+    """
+  This class computes CLEAR-MOT (MOTA, MOTP, IDSW, Frag, MT, ML) and IDF1 metrics of a sequence in process.
+  It is updated frame by frame with the ground truths and the output targets of the tracker, so a
+  configuration can be scored without writing the tracks to text files and evaluating them with the devkit.
+  A ground truth and a target are matched if their IoU is at least iou_threshold. Ground truths with zero
+  score (consider flag of the gt.txt files) are ignored. Unlike the official devkit, targets matched to
+  distractor classes are not removed, so FP can be slightly larger than the devkit result.
+  """
+
+    def __init__(self, iou_threshold=0.5):
+        self.iou_threshold = iou_threshold
+        self.counts = dict((name, 0) for name in count_names)
+        self.prev_match = {}    # gt id -> target id matched in the previous frame
+        self.last_match = {}    # gt id -> target id of the last match
+        self.gt_tracked = {}    # gt id -> matched or not when the gt was seen the last time
+        self.gt_frames = Counter()      # gt id -> number of frames
+        self.gt_matched = Counter()     # gt id -> number of matched frames
+        self.trk_frames = Counter()     # target id -> number of frames
+        self.pair_frames = Counter()    # (gt id, target id) -> number of frames with IoU >= iou_threshold
+
+    def update(self, gts, gt_ids, trackers):
+        """
+    Params:
+      gts - ground truths of the frame in the format [[x1,y1,x2,y2,score],...]
+      gt_ids - IDs of gts
+      trackers - output of Sort_OH.update in the format [[x1,y1,x2,y2,id],...]
+    """
+        gts = calculate_cost.as_boxes(gts)
+        gt_ids = np.asarray(gt_ids, dtype=int).reshape(-1)
+        if len(gts) > 0:
+            considered = gts[:, 4] > 0
+            gts = gts[considered]
+            gt_ids = gt_ids[considered]
+        trackers = calculate_cost.as_boxes(trackers)
+        trk_ids = trackers[:, 4].astype(int) if len(trackers) > 0 else np.empty(0, dtype=int)
+        counts = self.counts
+        counts['frames'] += 1
+        counts['num_gt'] += len(gts)
+        counts['num_trk'] += len(trackers)
+        self.gt_frames.update(gt_ids.tolist())
+        self.trk_frames.update(trk_ids.tolist())
+
+        iou = calculate_cost.iou_matrix(gts, trackers)
+        valid = iou >= self.iou_threshold
+        g_valid, t_valid = np.nonzero(valid)
+        self.pair_frames.update(zip(gt_ids[g_valid].tolist(), trk_ids[t_valid].tolist()))
+
+        # keep matches of the previous frame if they are still valid
+        gt_match = np.full(len(gts), -1)
+        trk_col = dict(zip(trk_ids.tolist(), range(len(trk_ids))))
+        for g, gt_id in enumerate(gt_ids.tolist()):
+            t = trk_col.get(self.prev_match.get(gt_id), -1)
+            if t >= 0 and valid[g, t]:
+                gt_match[g] = t
+        trk_free = np.ones(len(trackers), dtype=bool)
+        trk_free[gt_match[gt_match >= 0]] = False
+
+        # match the others, maximizing the number of matches and then the overlap
+        g_rest = np.where(gt_match < 0)[0]
+        t_rest = np.where(trk_free)[0]
+        if len(g_rest) > 0 and len(t_rest) > 0:
+            sub_valid = valid[np.ix_(g_rest, t_rest)]
+            if sub_valid.any():
+                cost = np.where(sub_valid, 1 - iou[np.ix_(g_rest, t_rest)], len(g_rest) + len(t_rest) + 1.)
+                rows, cols = linear_sum_assignment(cost)
+                ok = sub_valid[rows, cols]
+                gt_match[g_rest[rows[ok]]] = t_rest[cols[ok]]
+
+        matched = np.where(gt_match >= 0)[0]
+        counts['tp'] += len(matched)
+        counts['fn'] += len(gts) - len(matched)
+        counts['fp'] += len(trackers) - len(matched)
+        counts['iou_sum'] += float(iou[matched, gt_match[matched]].sum())
+
+        prev_match = {}
+        for g, gt_id in enumerate(gt_ids.tolist()):
+            tracked = gt_match[g] >= 0
+            if tracked:
+                trk_id = int(trk_ids[gt_match[g]])
+                last = self.last_match.get(gt_id)
+                if last is not None and last != trk_id:
+                    counts['idsw'] += 1
+                # tracking of this ground truth is resumed after an interruption
+                if last is not None and not self.gt_tracked[gt_id]:
+                    counts['frag'] += 1
+                self.last_match[gt_id] = trk_id
+                prev_match[gt_id] = trk_id
+                self.gt_matched[gt_id] += 1
+            self.gt_tracked[gt_id] = tracked
+        self.prev_match = prev_match
+
+    def summary(self):
+        """
+    Returns raw counts and metrics of the frames seen so far as a dict
+    """
+        counts = dict(self.counts)
+        # IDF1: one to one assignment of ground truth and target trajectories maximizing matched frames
+        gt_list = sorted(self.gt_frames)
+        trk_list = sorted(self.trk_frames)
+        idtp = 0
+        if len(gt_list) > 0 and len(trk_list) > 0 and len(self.pair_frames) > 0:
+            gt_row = dict(zip(gt_list, range(len(gt_list))))
+            trk_col = dict(zip(trk_list, range(len(trk_list))))
+            pairs = np.zeros((len(gt_list), len(trk_list)))
+            for (gt_id, trk_id), n in self.pair_frames.items():
+                pairs[gt_row[gt_id], trk_col[trk_id]] = n
+            rows, cols = linear_sum_assignment(-pairs)
+            idtp = int(pairs[rows, cols].sum())
+        counts['idtp'] = idtp
+        counts['idfn'] = counts['num_gt'] - idtp
+        counts['idfp'] = counts['num_trk'] - idtp
+        # mostly tracked, partially tracked and mostly lost ground truth trajectories
+        ratios = np.array([self.gt_matched[g] / float(self.gt_frames[g]) for g in gt_list])
+        counts['num_objects'] = len(gt_list)
+        counts['mt'] = int(np.sum(ratios >= 0.8))
+        counts['ml'] = int(np.sum(ratios < 0.2))
+        counts['pt'] = len(gt_list) - counts['mt'] - counts['ml']
+        return metrics_from_counts(counts)
+
+
+def metrics_from_counts(counts):
+    """
+  Adds MOTA, MOTP, IDF1, IDP, IDR, precision and recall to a dict of raw counts and returns it
+  """
+    metrics = dict(counts)
+    num_gt = float(max(counts['num_gt'], 1))
+    metrics['mota'] = 1. - (counts['fn'] + counts['fp'] + counts['idsw']) / num_gt
+    metrics['motp'] = counts['iou_sum'] / max(counts['tp'], 1)
+    metrics['recall'] = counts['tp'] / num_gt
+    metrics['precision'] = counts['tp'] / float(max(counts['num_trk'], 1))
+    metrics['idf1'] = 2. * counts['idtp'] / max(counts['num_gt'] + counts['num_trk'], 1)
+    metrics['idp'] = counts['idtp'] / float(max(counts['num_trk'], 1))
+    metrics['idr'] = counts['idtp'] / num_gt
+    return metrics
+
+
+def merge_summaries(summaries):
+    """
+  Sums raw counts of summaries of several sequences and returns the metrics of all of them
+  """
+    counts = dict((name, 0) for name in count_names)
+    for s in summaries:
+        for name in count_names:
+            counts[name] += s[name]
+    return metrics_from_counts(counts)
+
+
+def format_summary(metrics):
+    """
+  Returns a one line report of metrics
+  """
+    return ('MOTA: %.2f, MOTP: %.2f, IDF1: %.2f, MT: %d, ML: %d, FP: %d, FN: %d, IDSW: %d, Frag: %d'
+            % (metrics['mota'] * 100, metrics['motp'] * 100, metrics['idf1'] * 100, metrics['mt'], metrics['ml'],
+               metrics['fp'], metrics['fn'], metrics['idsw'], metrics['frag']))
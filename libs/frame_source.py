@@ -0,0 +1,95 @@
+import threading
+import collections
+import concurrent.futures
+import numpy as np
+import cv2
+from PIL import Image
+
+
+# reduced decoding of OpenCV, the JPEG decoder scales the image down while decoding
+reduced_modes = {1.: cv2.IMREAD_COLOR, 0.5: cv2.IMREAD_REDUCED_COLOR_2, 0.25: cv2.IMREAD_REDUCED_COLOR_4,
+                 0.125: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def read_image(path, mode='rgb', scale=1.):
+    """
+  Reads and decodes an image
+  mode 'rgb' decodes with PIL (the same array as np.array(Image.open(path))), 'bgr' decodes with OpenCV
+  scale is 1, 0.5, 0.25 or 0.125, images are decoded at reduced resolution with the scaling of the JPEG decoder
+  Returns (H,W,3) uint8 array
+  """
+    if mode == 'bgr':
+        im = cv2.imread(path, reduced_modes[scale])
+        if im is None:
+            raise IOError('can not read image %s' % path)
+        return im
+    img = Image.open(path)
+    if scale != 1.:
+        size = (int(round(img.size[0] * scale)), int(round(img.size[1] * scale)))
+        img.draft('RGB', size)
+        img = img.convert('RGB')
+        if img.size != size:
+            img = img.resize(size)
+    return np.array(img, dtype=np.uint8)
+
+
+class FrameReader(object):
+    """
+  This class reads the images img1/%06d.jpg of a sequence ahead of the frame that is used.
+  When frame f is requested, frames f+1..f+prefetch are decoded on background threads (decoding releases the
+  GIL), so the display and diff tools do not wait for the disk and the JPEG decoder.
+  Decoded images are kept in a bounded LRU cache, so several overlays or comparisons of the same frame share one
+  decode. Returned arrays are shared by the users of the cache and are read-only.
+  """
+    def __init__(self, common_path, mode='rgb', scale=1., prefetch=4, cache_size=16, workers=2, last_frame=None):
+        self.common_path = common_path
+        self.mode = mode
+        self.scale = scale
+        self.prefetch = prefetch
+        self.cache_size = max(cache_size, prefetch + 1)
+        self.last_frame = last_frame
+        self.cache = collections.OrderedDict()  # frame -> future of the decoded image, the oldest first
+        self.lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+    def path(self, frame):
+        return '%s/img1/%06d.jpg' % (self.common_path, frame)
+
+    def load(self, frame):
+        im = read_image(self.path(frame), self.mode, self.scale)
+        im.setflags(write=False)
+        return im
+
+    def request(self, frame):
+        """
+    Returns the future of the image of frame, decoding of it is started if it is not in the cache
+    """
+        with self.lock:
+            future = self.cache.get(frame)
+            if future is None:
+                future = self.executor.submit(self.load, frame)
+                self.cache[frame] = future
+            self.cache.move_to_end(frame)
+            # drop the least recently used frames
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return future
+
+    def get(self, frame):
+        """
+    Returns the decoded image of frame and starts reading the next frames
+    """
+        future = self.request(frame)
+        for f in range(frame + 1, frame + self.prefetch + 1):
+            if self.last_frame is not None and f > self.last_frame:
+                break
+            with self.lock:
+                cached = f in self.cache
+            if not cached:
+                self.request(f)
+        # the requested frame is the most recently used one again
+        self.request(frame)
+        return future.result()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,150 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from . import calculate_cost
+
+
+def grid_cells(boxes, cell_size):
+    """
+  Returns (box index, cell key) of every uniform grid cell that every bounding box [x1,y1,x2,y2] touches
+  """
+    c0 = np.floor(boxes[:, 0:2] / cell_size).astype(np.int64)
+    c1 = np.floor(boxes[:, 2:4] / cell_size).astype(np.int64)
+    nx = np.maximum(c1[:, 0] - c0[:, 0] + 1, 1)
+    ny = np.maximum(c1[:, 1] - c0[:, 1] + 1, 1)
+    counts = nx * ny
+    index = np.repeat(np.arange(len(boxes)), counts)
+    # position of every cell inside the cells of its box
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cx = c0[index, 0] + local % nx[index]
+    cy = c0[index, 1] + local // nx[index]
+    # shift to non negative values before combining x and y into one key
+    return index, (cx - cx.min()) * (cy.max() - cy.min() + 1) + (cy - cy.min()) if len(index) > 0 else index
+
+
+def candidate_pairs(bbs_a, bbs_b, cell_size=None):
+    """
+  Finds pairs of (N,4) and (M,4) bounding boxes that share a cell of a uniform grid
+  Pairs that do not share a cell can not overlap, so their IoU is zero and it is not computed
+  Returns (ia, ib) index arrays of the candidate pairs, without repetition
+  """
+    if len(bbs_a) == 0 or len(bbs_b) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    boxes = np.concatenate((bbs_a[:, 0:4], bbs_b[:, 0:4]))
+    if cell_size is None:
+        # cells about the size of a typical box keep the number of cells of every box small
+        cell_size = max(np.median(boxes[:, 2] - boxes[:, 0]), np.median(boxes[:, 3] - boxes[:, 1]), 1.)
+    index, key = grid_cells(boxes, cell_size)
+    is_a = index < len(bbs_a)
+    ia_cell, a_key = index[is_a], key[is_a]
+    ib_cell, b_key = index[~is_a] - len(bbs_a), key[~is_a]
+    # for every cell of a, all cells of b with the same key
+    order = np.argsort(b_key, kind='stable')
+    ib_cell, b_key = ib_cell[order], b_key[order]
+    lo = np.searchsorted(b_key, a_key, side='left')
+    hi = np.searchsorted(b_key, a_key, side='right')
+    n = hi - lo
+    ia = np.repeat(ia_cell, n)
+    ib = ib_cell[np.repeat(lo, n) + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)]
+    # boxes sharing several cells are found several times
+    pair_key = np.unique(ia * len(bbs_b) + ib)
+    return pair_key // len(bbs_b), pair_key % len(bbs_b)
+
+
+def pair_iou(bbs_a, bbs_b, ia, ib):
+    """
+  Computes IoU of the pairs (bbs_a[ia], bbs_b[ib]), the same values as cal_iou() gives for them
+  """
+    a = bbs_a[ia]
+    b = bbs_b[ib]
+    w = np.maximum(0., np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0]))
+    h = np.maximum(0., np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1]))
+    wh = w * h
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    o = np.zeros(len(wh))
+    np.divide(wh, area_a + area_b - wh, out=o, where=(w != 0) & (h != 0))
+    return o.astype(np.float32)
+
+
+def sparse_iou(bbs_a, bbs_b, cell_size=None):
+    """
+  Returns (ia, ib, iou) of all pairs of bounding boxes with positive IoU
+  """
+    bbs_a = calculate_cost.as_boxes(bbs_a)
+    bbs_b = calculate_cost.as_boxes(bbs_b)
+    ia, ib = candidate_pairs(bbs_a, bbs_b, cell_size)
+    iou = pair_iou(bbs_a, bbs_b, ia, ib)
+    positive = iou > 0
+    return ia[positive], ib[positive], iou[positive]
+
+
+def max_ios(bbs, cell_size=None, dense_size=64):
+    """
+  Computes for every one of (N,4) bounding boxes the maximum IOS of it with any other box, i.e. the largest ratio of
+  it covered by another box, without the (N,N) matrix. Only pairs sharing a cell of the grid are computed.
+  Up to dense_size boxes, the (N,N) matrix is computed as before.
+  Returns (N,) float32 vector, equal to np.amax(cal_ios_matrix(bbs), axis=0)
+  """
+    bbs = calculate_cost.as_boxes(bbs)
+    if 0 < len(bbs) <= dense_size:
+        # the grid does not pay off for a few boxes
+        return np.amax(calculate_cost.cal_ios_matrix(bbs), axis=0)
+    result = np.zeros(len(bbs), dtype=np.float32)
+    ia, ib = candidate_pairs(bbs, bbs, cell_size)
+    other = ia != ib
+    ia, ib = ia[other], ib[other]
+    if len(ia) == 0:
+        return result
+    a = bbs[ia]
+    b = bbs[ib]
+    w = np.maximum(0., np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0]))
+    h = np.maximum(0., np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ios = ((w * h) / ((b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]))).astype(np.float32)
+        # ratio of ib covered by ia
+        np.maximum.at(result, ib, ios)
+    return result
+
+
+def gated_assignment(n_a, n_b, ia, ib, weights):
+    """
+  Maximum weight assignment of a sparse bipartite graph of n_a and n_b nodes with edges (ia, ib, weights)
+  Pairs without an edge have zero weight, so the graph is split into connected components and every
+  component is solved separately. Components with a single edge are matched directly.
+  Returns (K,2) matched pairs with positive weight, sorted by the first column, and their weights
+  """
+    if len(ia) == 0:
+        return np.empty((0, 2), dtype=int), np.empty(0, dtype=np.float32)
+    deg_a = np.bincount(ia, minlength=n_a)
+    deg_b = np.bincount(ib, minlength=n_b)
+    single = (deg_a[ia] == 1) & (deg_b[ib] == 1)
+    pairs = [np.stack((ia[single], ib[single]), axis=1)]
+    pair_weights = [weights[single]]
+
+    ia, ib, weights = ia[~single], ib[~single], weights[~single]
+    if len(ia) > 0:
+        # nodes 0..n_a-1 are a, nodes n_a..n_a+n_b-1 are b
+        graph = coo_matrix((np.ones(len(ia)), (ia, ib + n_a)), shape=(n_a + n_b, n_a + n_b))
+        num, labels = connected_components(graph, directed=False)
+        edge_label = labels[ia]
+        order = np.argsort(edge_label, kind='stable')
+        bounds = np.searchsorted(edge_label[order], np.arange(num + 1))
+        for c in range(num):
+            edges = order[bounds[c]:bounds[c + 1]]
+            if len(edges) == 0:
+                continue
+            rows, row_pos = np.unique(ia[edges], return_inverse=True)
+            cols, col_pos = np.unique(ib[edges], return_inverse=True)
+            sub = np.zeros((len(rows), len(cols)), dtype=np.float32)
+            sub[row_pos, col_pos] = weights[edges]
+            r, c_ = linear_sum_assignment(-sub)
+            positive = sub[r, c_] > 0
+            pairs.append(np.stack((rows[r[positive]], cols[c_[positive]]), axis=1))
+            pair_weights.append(sub[r[positive], c_[positive]])
+
+    pairs = np.concatenate(pairs)
+    pair_weights = np.concatenate(pair_weights)
+    order = np.argsort(pairs[:, 0], kind='stable')
+    return pairs[order], pair_weights[order]
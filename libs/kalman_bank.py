@@ -0,0 +1,233 @@
+import numpy as np
+from . import convert
+from . import track_table
+from .kalman_tracker import KalmanBoxTracker
+
+
+class KalmanBankFilter(object):
+    """
+  Read-only view of one row of the filter bank, exposing the same x and P attributes as filterpy KalmanFilter.
+  """
+    def __init__(self, bank, trk):
+        self.bank = bank
+        self.trk = trk
+
+    @property
+    def x(self):
+        return self.bank.x[self.trk.row]
+
+    @property
+    def P(self):
+        return self.bank.P[self.trk.row]
+
+
+class BankedBoxTracker(track_table.TrackRecord):
+    """
+  This class represents the internel state of an individual tracked object whose Kalman filter lives in a bank.
+  Its row in the bank is set when it is appended to the bank, or it is given when the row is already filled.
+  """
+    def __init__(self, bank, trk_id=None, row=None):
+        self.bank = bank
+        if row is not None:
+            # the filter and the record of the target are already in the bank, e.g. by restore()
+            self.table = bank
+            self.row = row
+            return
+        self.init_record()
+        self.time_since_update = 0
+        if trk_id is None:
+            trk_id = KalmanBoxTracker.count
+            KalmanBoxTracker.count += 1
+        self.id = trk_id
+        self.age = 0
+        self.time_since_observed = 0    # The period that an object is detected as occluded
+        self.confidence = 0.5
+
+    @property
+    def kf(self):
+        return KalmanBankFilter(self.bank, self)
+
+    def detach(self):
+        """
+    Moves the row of the target and its filter to a bank of its own, when it is removed from the bank of a tracker,
+    so its state is not read from the row of another target.
+    """
+        bank = KalmanBoxTrackerBank(capacity=1)
+        bank.x_buf[0] = self.bank.x_buf[self.row]
+        bank.P_buf[0] = self.bank.P_buf[self.row]
+        bank.rec_buf[0] = self.table.rec_buf[self.row]
+        bank.trackers.append(self)
+        self.bank = bank
+        self.table = bank
+        self.row = 0
+
+    def get_state(self):
+        """
+    Returns the current bounding box estimate.
+    """
+        return convert.x_to_bbox(self.bank.x[self.row])
+
+
+class KalmanBoxTrackerBank(track_table.TrackTable):
+    """
+  This class keeps the Kalman filters of all targets in one array-backed bank.
+  States are stored in a (N,7,1) array and covariances in a (N,7,7) array, so prediction and
+  correction of all targets is done with a few batched matrix operations.
+  The bank is the track table of the targets: row i of the arrays and of the table always belongs to tracker i.
+  """
+    def __init__(self, capacity=64):
+        super(KalmanBoxTrackerBank, self).__init__(capacity)
+        # constant velocity model, the same as KalmanBoxTracker
+        self.F = np.array(
+            [[1, 0, 0, 0, 1, 0, 0], [0, 1, 0, 0, 0, 1, 0], [0, 0, 1, 0, 0, 0, 1], [0, 0, 0, 1, 0, 0, 0],
+             [0, 0, 0, 0, 1, 0, 0], [0, 0, 0, 0, 0, 1, 0], [0, 0, 0, 0, 0, 0, 1]])
+        self.H = np.array(
+            [[1, 0, 0, 0, 0, 0, 0], [0, 1, 0, 0, 0, 0, 0], [0, 0, 1, 0, 0, 0, 0], [0, 0, 0, 1, 0, 0, 0]])
+        self.R = np.eye(4)
+        self.Q = np.eye(7)
+        self.Q[-1, -1] *= 0.01
+        self.Q[4:, 4:] *= 0.01
+        self.I = np.eye(7)
+        self.x_buf = np.zeros((capacity, 7, 1))
+        self.P_buf = np.zeros((capacity, 7, 7))
+
+    @property
+    def x(self):
+        return self.x_buf[:len(self.trackers)]
+
+    @property
+    def P(self):
+        return self.P_buf[:len(self.trackers)]
+
+    def add(self, bbox, init_mode, bbox_before, trk_id=None):
+        """
+    Initialises a new target in the next free row of the bank using initial bounding box.
+    """
+        n = len(self.trackers)
+        if n == len(self.x_buf):
+            self.grow()
+        x = np.zeros((7, 1))
+        P = np.eye(7)
+        P[4:, 4:] *= 10.  # give high uncertainty to the unobservable initial velocities
+        if init_mode == 0:
+            P *= 10.
+            x[:4] = convert.bbox_to_z(bbox)
+        elif init_mode == 1:
+            state_before = convert.bbox_to_z(bbox_before)
+            state = convert.bbox_to_z(bbox)
+            x[:4] = state
+            x[4:] = state[0:3] - state_before[0:3]
+        self.x_buf[n] = x
+        self.P_buf[n] = P
+        trk = BankedBoxTracker(self, trk_id)
+        self.append(trk)
+        return trk
+
+    def restore(self, x, P, rec):
+        """
+    Replaces the targets of the bank with the targets of states x (N,7), covariances P (N,7,7) and rows rec of the
+    track table, e.g. of a snapshot. The arrays are copied in one step, without adding the targets one by one.
+    """
+        n = len(rec)
+        while n > len(self.x_buf):
+            self.grow()
+        if n > len(self.rec_buf):
+            self.rec_buf = np.zeros(len(self.x_buf), dtype=track_table.track_dtype)
+        self.x_buf[:n] = np.reshape(x, (n, 7, 1))
+        self.P_buf[:n] = P
+        self.rec_buf[:n] = rec
+        self.trackers = [BankedBoxTracker(self, row=row) for row in range(n)]
+
+    def grow(self):
+        """
+    Doubles the number of rows of the bank.
+    """
+        self.x_buf = np.concatenate((self.x_buf, np.zeros_like(self.x_buf)))
+        self.P_buf = np.concatenate((self.P_buf, np.zeros_like(self.P_buf)))
+
+    def compact(self, keep):
+        """
+    Removes the targets where keep is False and moves the rows of the others up, keeping their order.
+    """
+        keep = np.asarray(keep, dtype=bool)
+        if keep.all():
+            return
+        n = len(self.trackers)
+        k = int(keep.sum())
+        # removed targets copy their filters before the rows are moved
+        super(KalmanBoxTrackerBank, self).compact(keep)
+        self.x_buf[:k] = self.x_buf[:n][keep]
+        self.P_buf[:k] = self.P_buf[:n][keep]
+
+    def predict(self):
+        """
+    Advances the state vectors of all targets and returns the predicted bounding boxes as a (N,4) array.
+    """
+        x = self.x
+        P = self.P
+        # to prevent area become negative after prediction, make zero the rate of area change
+        x[(x[:, 6, 0] + x[:, 2, 0]) <= 0, 6] *= 0.0
+        x[:] = np.matmul(self.F, x)
+        P[:] = np.matmul(np.matmul(self.F, P), self.F.T) + self.Q
+        self.rec['age'] += 1
+        self.rec['time_since_update'] += 1
+        return self.get_state()
+
+    def update(self, rows, bboxes, isz):
+        """
+    Updates the state vectors of targets in rows with observed bboxes.
+    isz is a boolean mask over rows: observed targets are corrected with their bbox, the others
+    are occluded targets whose area change ratio is decreased and which are not corrected.
+    """
+        rows = np.asarray(rows, dtype=int)
+        isz = np.asarray(isz, dtype=bool)
+        self.rec['time_since_update'][rows] = 0
+        occluded = rows[~isz]
+        # decrease area change ratio
+        self.x_buf[occluded, 6] /= 2
+        observed = rows[isz]
+        if len(observed) == 0:
+            return
+        self.rec['time_since_observed'][observed] = 0
+        z = bbox_to_z(np.asarray(bboxes)[isz])
+        x = self.x_buf[observed]
+        P = self.P_buf[observed]
+        y = z - np.matmul(self.H, x)
+        PHT = np.matmul(P, self.H.T)
+        S = np.matmul(self.H, PHT) + self.R
+        SI = np.linalg.inv(S)
+        K = np.matmul(PHT, SI)
+        x = x + np.matmul(K, y)
+        I_KH = self.I - np.matmul(K, self.H)
+        P = np.matmul(np.matmul(I_KH, P), np.swapaxes(I_KH, 1, 2)) + \
+            np.matmul(np.matmul(K, self.R), np.swapaxes(K, 1, 2))
+        self.x_buf[observed] = x
+        self.P_buf[observed] = P
+
+    def get_state(self):
+        """
+    Returns the current bounding box estimates of all targets as a (N,4) array.
+    """
+        return x_to_bbox(self.x[:, :, 0])
+
+
+def bbox_to_z(bboxes):
+    """
+  Batched version of convert.bbox_to_z, takes (N,4+) bounding boxes and returns (N,4,1) measurements
+  """
+    w = bboxes[:, 2] - bboxes[:, 0]
+    h = bboxes[:, 3] - bboxes[:, 1]
+    x = bboxes[:, 0] + w / 2.
+    y = bboxes[:, 1] + h / 2.
+    s = w * h  # scale is just area
+    r = w / h.astype(float)
+    return np.stack((x, y, s, r), axis=1).reshape((-1, 4, 1))
+
+
+def x_to_bbox(x):
+    """
+  Batched version of convert.x_to_bbox, takes (N,4+) states and returns (N,4) bounding boxes
+  """
+    w = np.sqrt(x[:, 2] * x[:, 3])
+    h = x[:, 2] / w
+    return np.stack((x[:, 0] - w / 2., x[:, 1] - h / 2., x[:, 0] + w / 2., x[:, 1] + h / 2.), axis=1)
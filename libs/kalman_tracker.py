@@ -1,18 +1,24 @@
 import numpy as np
-from filterpy.kalman import KalmanFilter
 from . import convert
+from . import track_table
 
 
-class KalmanBoxTracker(object):
+class KalmanBoxTracker(track_table.TrackRecord):
     """
   This class represents the internel state of individual tracked objects observed as bbox.
+  Its id, age, time_since_update, time_since_observed and confidence are a row of a track table.
   """
     count = 0
 
-    def __init__(self, bbox, init_mode, bbox_before):
+    def __init__(self, bbox, init_mode, bbox_before, trk_id=None):
         """
     Initialises a tracker using initial bounding box.
+    If trk_id is None, the ID is taken from the global counter KalmanBoxTracker.count
     """
+        # filterpy is imported with the first target, it imports scipy.stats, which is slow to import and is not
+        # needed by the filter bank of batched mode
+        from filterpy.kalman import KalmanFilter
+        self.init_record()
         # define constant velocity model
         # (u, v, s, r, u_dot, v_dot, s_dot) -> (u,v): location center, s: area, r: aspect ratio
         self.kf = KalmanFilter(dim_x=7, dim_z=4)
@@ -42,8 +48,10 @@ class KalmanBoxTracker(object):
             self.kf.x[4:] = state[0:3] - state_before[0:3]
 
         self.time_since_update = 0
-        self.id = KalmanBoxTracker.count
-        KalmanBoxTracker.count += 1
+        if trk_id is None:
+            trk_id = KalmanBoxTracker.count
+            KalmanBoxTracker.count += 1
+        self.id = trk_id
         self.age = 0
         # self.oc_number = 0  # Number of time an object is occluded
         self.time_since_observed = 0    # The period that an object is detected as occluded
@@ -0,0 +1,201 @@
+import os.path
+import json
+import numpy as np
+
+
+class MOTSource(object):
+    """
+  This class keeps the boxes of a MOTChallenge text file (det.txt or gt.txt) sorted by frame number.
+  Rows are stored as [x1,y1,x2,y2,score] in one array and an offset index gives the rows of every frame,
+  so the boxes of a frame are returned as a slice (a view, without copy) in constant time.
+  The ID column of the file is kept in the same order in ids.
+  """
+
+    def __init__(self, frames, boxes, last_frame=None, is_sorted=False, ids=None):
+        """
+    Params:
+      frames - frame number of every row
+      boxes - array of rows in the format [[x1,y1,x2,y2,score],...] with the same order as frames
+      last_frame - number of the last frame of the sequence, by default the largest frame number in frames
+      is_sorted - rows are already sorted by frame, so frames and boxes are used as they are without copy
+                  (e.g. arrays memory-mapped from the cache)
+      ids - optional ID of every row with the same order as frames, by default -1
+    """
+        if ids is None:
+            ids = np.full(len(frames), -1)
+        if not is_sorted:
+            frames = np.asarray(frames, dtype=int)
+            order = np.argsort(frames, kind='stable')   # keep the file order of boxes inside a frame
+            frames = frames[order]
+            boxes = np.ascontiguousarray(boxes[order])
+            boxes.flags.writeable = False
+            ids = np.asarray(ids, dtype=int)[order]
+            ids.flags.writeable = False
+        self.frames = frames
+        self.boxes = boxes
+        self.ids = ids
+        if last_frame is None:
+            last_frame = int(self.frames.max()) if len(self.frames) > 0 else 0
+        self.last_frame = last_frame
+        # rows of frame f are boxes[offsets[f]:offsets[f + 1]]
+        self.offsets = np.searchsorted(self.frames, np.arange(self.last_frame + 2))
+
+    def __getitem__(self, frame):
+        """
+    Returns the boxes of frame as a read-only (K,5) view
+    """
+        if frame < 0 or frame > self.last_frame:
+            return self.boxes[0:0]
+        return self.boxes[self.offsets[frame]:self.offsets[frame + 1]]
+
+    def frame_ids(self, frame):
+        """
+    Returns the IDs of the boxes of frame, in the same order as self[frame]
+    """
+        if frame < 0 or frame > self.last_frame:
+            return self.ids[0:0]
+        return self.ids[self.offsets[frame]:self.offsets[frame + 1]]
+
+    def __len__(self):
+        return self.last_frame
+
+    def __iter__(self):
+        """
+    Yields (frame, boxes) for every frame of the sequence, frame numbers begin at 1
+    """
+        for frame in range(1, self.last_frame + 1):
+            yield frame, self[frame]
+
+
+def mot_rows_to_boxes(rows, min_score=None):
+    """
+  Takes rows of a MOTChallenge file and returns (frames, boxes, ids, last_frame)
+  boxes are converted from [x1,y1,w,h,score] to [x1,y1,x2,y2,score] and rows with score lower than
+  min_score are removed. last_frame is computed before removing rows.
+  """
+    last_frame = int(rows[:, 0].max()) if len(rows) > 0 else 0
+    if min_score is not None:
+        rows = rows[rows[:, 6] >= min_score]
+    boxes = rows[:, 2:7].copy()
+    boxes[:, 2:4] += boxes[:, 0:2]  # convert [x1,y1,w,h] to [x1,y1,x2,y2]
+    return rows[:, 0].astype(int), boxes, rows[:, 1].astype(int), last_frame
+
+
+def load_mot(path, min_score=None, cache=False, cache_dir=None):
+    """
+  Parses a MOTChallenge text file once and returns a frame indexed MOTSource
+  If cache is True, the parsed rows are saved as a binary .npy file in cache_dir (by default next to the
+  text file) and on later calls they are memory-mapped with np.load(mmap_mode='r') instead of parsing the text,
+  as long as the size and modification time of the text file are not changed.
+  A .npy output of the tracker (see results_sink.py) is memory-mapped instead of parsed.
+  """
+    if path.endswith('.npy'):
+        return load_mot_npy(path, min_score)
+    if cache:
+        source = load_mot_cache(path, min_score, cache_dir)
+        if source is not None:
+            return source
+    rows = np.loadtxt(path, delimiter=',', ndmin=2)
+    frames, boxes, ids, last_frame = mot_rows_to_boxes(rows, min_score)
+    source = MOTSource(frames, boxes, last_frame, ids=ids)
+    if cache:
+        save_mot_cache(path, min_score, cache_dir, source)
+    return source
+
+
+def mot_cache_path(path, min_score, cache_dir):
+    """
+  Returns the paths of the .npy data file and .json meta file that cache the text file in path
+  """
+    if cache_dir is None:
+        cache_dir = os.path.dirname(path)
+    name = os.path.basename(path)
+    if min_score is not None:
+        name = '%s.s%g' % (name, min_score)
+    stem = os.path.join(cache_dir, name)
+    return stem + '.npy', stem + '.json'
+
+
+def mot_source_stamp(path):
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def load_mot_cache(path, min_score, cache_dir):
+    """
+  Memory-maps the cached rows of path, returns None if there is no valid cache
+  """
+    data_path, meta_path = mot_cache_path(path, min_score, cache_dir)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta['source'] != mot_source_stamp(path):
+            return None
+        # first column: frame numbers, next columns: [x1,y1,x2,y2,score], last column: IDs
+        data = np.load(data_path, mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        return None
+    if data.ndim != 2 or data.shape[1] != 7:
+        return None
+    return MOTSource(data[:, 0], data[:, 1:6], meta['last_frame'], is_sorted=True, ids=data[:, 6])
+
+
+def save_mot_cache(path, min_score, cache_dir, source):
+    """
+  Saves the sorted rows of source as the cache of path. A failure to write the cache is not an error.
+  """
+    data_path, meta_path = mot_cache_path(path, min_score, cache_dir)
+    data = np.concatenate((np.asarray(source.frames, dtype=np.float64).reshape(-1, 1), source.boxes,
+                           np.asarray(source.ids, dtype=np.float64).reshape(-1, 1)), axis=1)
+    meta = {'source': mot_source_stamp(path), 'last_frame': source.last_frame}
+    try:
+        if not os.path.exists(os.path.dirname(data_path) or '.'):
+            os.makedirs(os.path.dirname(data_path))
+        # write to temporary files and rename them, so parallel runs never read a partial cache
+        tmp = '.%d.tmp' % os.getpid()
+        with open(data_path + tmp, 'wb') as f:
+            np.save(f, data)
+        with open(meta_path + tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(data_path + tmp, data_path)
+        os.replace(meta_path + tmp, meta_path)
+    except OSError:
+        pass
+
+
+def load_mot_npy(path, min_score=None):
+    """
+  Memory-maps a .npy file of rows [frame,x1,y1,x2,y2,score,id] sorted by frame and returns a MOTSource
+  """
+    data = np.load(path, mmap_mode='r')
+    if data.ndim != 2 or data.shape[1] != 7:
+        raise ValueError('%s is not an array of [frame,x1,y1,x2,y2,score,id] rows' % path)
+    if min_score is not None:
+        data = data[data[:, 5] >= min_score]
+    return MOTSource(data[:, 0], data[:, 1:6], is_sorted=True, ids=data[:, 6])
+
+
+def stream_mot(path, min_score=None):
+    """
+  Lazily reads a MOTChallenge text file that is sorted by frame number (such as det.txt) line by line
+  Yields (frame, boxes) for every frame, including frames without any box, beginning at frame 1
+  Only the rows of the current frame are kept in memory, so it can be used for very long sequences
+  """
+    frame = 1
+    rows = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = [float(v) for v in line.split(',')]
+            row_frame = int(row[0])
+            if row_frame < frame:
+                raise ValueError('%s is not sorted by frame number' % path)
+            while row_frame > frame:
+                yield frame, mot_rows_to_boxes(np.array(rows).reshape(-1, len(row)), min_score)[1]
+                frame += 1
+                rows = []
+            rows.append(row)
+    if rows:
+        yield frame, mot_rows_to_boxes(np.array(rows), min_score)[1]
@@ -0,0 +1,162 @@
+import numpy as np
+from . import tracker
+from . import kalman_bank
+from . import calculate_cost
+
+
+class StreamBank(kalman_bank.KalmanBoxTrackerBank):
+    """
+  Filter bank of one stream whose rows are a slice of the padded arrays of a SharedKalmanBank.
+  """
+    def __init__(self, shared, stream):
+        super(StreamBank, self).__init__(capacity=0)
+        self.shared = shared
+        self.stream = stream
+
+    def grow(self):
+        self.shared.grow()
+
+
+class SharedKalmanBank(object):
+    """
+  This class keeps the filter banks of several independent streams in padded arrays: states in a (S,C,7,1)
+  array and covariances in a (S,C,7,7) array, where stream s uses the first len(banks[s]) rows of [s].
+  Every stream behaves like its own KalmanBoxTrackerBank, but all of them are predicted together.
+  """
+    def __init__(self, capacity=16):
+        self.banks = []
+        self.x_buf = np.zeros((0, capacity, 7, 1))
+        self.P_buf = np.zeros((0, capacity, 7, 7))
+
+    def add_bank(self):
+        """
+    Adds the bank of a new stream and returns it
+    """
+        self.x_buf = np.concatenate((self.x_buf, np.zeros((1,) + self.x_buf.shape[1:])))
+        self.P_buf = np.concatenate((self.P_buf, np.zeros((1,) + self.P_buf.shape[1:])))
+        bank = StreamBank(self, len(self.banks))
+        self.banks.append(bank)
+        self.attach()
+        return bank
+
+    def grow(self):
+        """
+    Doubles the number of rows of every stream
+    """
+        self.x_buf = np.concatenate((self.x_buf, np.zeros_like(self.x_buf)), axis=1)
+        self.P_buf = np.concatenate((self.P_buf, np.zeros_like(self.P_buf)), axis=1)
+        self.attach()
+
+    def attach(self):
+        for s, bank in enumerate(self.banks):
+            bank.x_buf = self.x_buf[s]
+            bank.P_buf = self.P_buf[s]
+
+    def predict(self):
+        """
+    Advances the state vectors of the targets of all streams, the same as predict() of every bank
+    Returns (boxes, area_sums), (S,R,4) predicted bounding boxes where R is the number of targets of the
+    largest stream, and (S,1) sums of the predicted areas of the targets of every stream
+    """
+        counts = np.array([len(bank) for bank in self.banks], dtype=int)
+        rows = counts.max() if len(counts) > 0 else 0
+        model = self.banks[0] if len(self.banks) > 0 else None
+        x = self.x_buf[:, :rows]
+        P = self.P_buf[:, :rows]
+        area_sums = np.zeros((len(counts), 1))
+        if rows == 0:
+            return np.zeros((len(counts), 0, 4)), area_sums
+        # to prevent area become negative after prediction, make zero the rate of area change
+        x[(x[:, :, 6, 0] + x[:, :, 2, 0]) <= 0, 6] *= 0.0
+        x[:] = np.matmul(model.F, x)
+        P[:] = np.matmul(np.matmul(model.F, P), model.F.T) + model.Q
+        for bank in self.banks:
+            bank.rec['age'] += 1
+            bank.rec['time_since_update'] += 1
+        # cumulative sum adds areas one by one in the same order as the per-target loop
+        area_cum = np.cumsum(x[:, :, 2, 0], axis=1)
+        has_trks = counts > 0
+        area_sums[has_trks, 0] = area_cum[has_trks, counts[has_trks] - 1]
+        # rows after the targets of a stream are padding and give invalid boxes
+        with np.errstate(divide='ignore', invalid='ignore'):
+            boxes = kalman_bank.x_to_bbox(x[:, :, :, 0].reshape(-1, 7)).reshape(len(counts), rows, 4)
+        return boxes, area_sums
+
+
+class MultiSort_OH(object):
+    """
+  This class tracks many independent streams (e.g. cameras) together. Every stream has its own Sort_OH with its
+  own ID counter, and their Kalman filters live in one SharedKalmanBank. In every update, the prediction,
+  the outside image ratios and the IoU matrices of all streams are computed in one batched pass, and only
+  the assignment and the rest of the update are done stream by stream.
+  The results are the same as running every stream on its own batched Sort_OH.
+  """
+    def __init__(self, max_age=3, min_hits=3, gated=False):
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.gated = gated
+        self.bank = SharedKalmanBank()
+        self.streams = []
+
+    def add_stream(self, seq, conf_trgt=0.35, conf_objt=0.75, scene=None, birth_frames=3):
+        """
+    Adds a stream and returns its Sort_OH, whose attributes can be changed like a separate tracker
+    birth_frames is the number of frames of unmatched detections that create a new target in this stream
+    """
+        mot_tracker = tracker.Sort_OH(max_age=self.max_age, min_hits=self.min_hits, batched=True, gated=self.gated,
+                                      birth_frames=birth_frames)
+        mot_tracker.trackers = self.bank.add_bank()
+        mot_tracker.seq = seq
+        mot_tracker.conf_trgt = conf_trgt
+        mot_tracker.conf_objt = conf_objt
+        mot_tracker.scene = scene
+        mot_tracker.next_id = 0
+        self.streams.append(mot_tracker)
+        return mot_tracker
+
+    def update(self, dets, gts=None, gt_ids=None):
+        """
+    Params:
+      dets - list of detections of the new frame of every stream, in the format of Sort_OH.update
+      gts - optional list of ground truths of every stream
+      gt_ids - optional list of IDs of gts of every stream
+    Requires: this method must be called once for each frame of all streams even with empty detections.
+    Returns the list of outputs of Sort_OH.update of every stream
+    """
+        num = len(self.streams)
+        dets = [calculate_cost.as_boxes(d) for d in dets]
+        gts = gts if gts is not None else [[] for _ in range(num)]
+        gt_ids = gt_ids if gt_ids is not None else [None] * num
+
+        # predict all streams and compute the outside image ratio of all predicted boxes at once
+        counts = [len(mot_tracker.trackers) for mot_tracker in self.streams]
+        boxes, area_sums = self.bank.predict()
+        predicted = [boxes[s, :counts[s]] for s in range(num)]
+        scenes = np.repeat(np.array([mot_tracker.scene_size() for mot_tracker in self.streams]).reshape(-1, 2),
+                           counts, axis=0)
+        outside = calculate_cost.cal_outside(np.concatenate(predicted), scenes.T) if sum(counts) > 0 \
+            else np.zeros(0, dtype=np.float32)
+        outside = np.split(outside, np.cumsum(counts)[:-1])
+        trks = []
+        area_avgs = []
+        for s, mot_tracker in enumerate(self.streams):
+            trk, area_avg = mot_tracker.predict_targets(len(dets[s]), predicted[s],
+                                                        area_sums[s] if counts[s] > 0 else None, outside[s])
+            trks.append(trk)
+            area_avgs.append(area_avg)
+
+        # IoU of detections and targets of all streams, padded to the largest stream
+        ious = [None] * num
+        if not self.gated and num > 0:
+            max_dets = max(len(d) for d in dets)
+            max_trks = max(len(t) for t in trks)
+            det_pad = np.zeros((num, max_dets, 4))
+            trk_pad = np.zeros((num, max_trks, 4))
+            for s in range(num):
+                det_pad[s, :len(dets[s])] = dets[s][:, 0:4]
+                trk_pad[s, :len(trks[s])] = trks[s][:, 0:4]
+            iou = calculate_cost.iou_matrix(det_pad, trk_pad).astype(np.float32)
+            ious = [iou[s, :len(dets[s]), :len(trks[s])] for s in range(num)]
+
+        return [mot_tracker.update_targets(dets[s], gts[s], gt_ids[s], trks[s], area_avgs[s], ious[s])
+                for s, mot_tracker in enumerate(self.streams)]
@@ -0,0 +1,196 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from . import calculate_cost
+from . import mot_source
+
+
+# one row for every frame
+frame_dtype = [('frame', 'i4'), ('boxes1', 'i4'), ('boxes2', 'i4'), ('matched', 'i4'), ('added', 'i4'),
+               ('dropped', 'i4'), ('shifted', 'i4'), ('id_swaps', 'i4'), ('mean_iou', 'f4')]
+# one row for every box that is added, dropped or shifted and every ID swap
+event_dtype = [('frame', 'i4'), ('kind', 'U7'), ('id1', 'i4'), ('id2', 'i4'), ('iou', 'f4'),
+               ('x1', 'f4'), ('y1', 'f4'), ('x2', 'f4'), ('y2', 'f4')]
+# one row for every ID of both outputs
+id_dtype = [('output', 'i1'), ('id', 'i4'), ('frames', 'i4'), ('matched', 'i4'), ('unmatched', 'i4'),
+            ('shifted', 'i4'), ('id_swaps', 'i4'), ('partners', 'i4')]
+
+
+def match_frame(boxes1, boxes2, iou_threshold=0.3):
+    """
+  Matches the boxes [x1,y1,x2,y2,...] of a frame of two outputs with the IoU of all pairs in one call
+  Returns (K,2) matched indexes sorted by the first column and their IoU
+  """
+    if len(boxes1) == 0 or len(boxes2) == 0:
+        return np.empty((0, 2), dtype=int), np.empty(0)
+    if boxes1.shape == boxes2.shape and np.array_equal(boxes1[:, 0:4], boxes2[:, 0:4]):
+        # the same boxes in the same order, usual for frames where the outputs agree
+        index = np.arange(len(boxes1))
+        return np.stack((index, index), axis=1), np.ones(len(boxes1))
+    iou = calculate_cost.iou_matrix(boxes1[:, 0:4], boxes2[:, 0:4])
+    rows, cols = linear_sum_assignment(-iou)
+    ious = iou[rows, cols]
+    keep = ious >= iou_threshold
+    return np.stack((rows[keep], cols[keep]), axis=1), ious[keep]
+
+
+def box_events(frame, kind, boxes, id1, id2, iou):
+    events = np.zeros(len(boxes), dtype=event_dtype)
+    events['frame'] = frame
+    events['kind'] = kind
+    events['id1'] = id1
+    events['id2'] = id2
+    events['iou'] = iou
+    for c, name in enumerate(('x1', 'y1', 'x2', 'y2')):
+        events[name] = boxes[:, c]
+    return events
+
+
+class OutputDiff(object):
+    """
+  This class compares two tracker outputs of a sequence frame by frame.
+  Boxes of a frame are matched by IoU (at least iou_threshold). A box of the first output without match is
+  dropped, a box of the second output without match is added, and a matched pair with IoU lower than shift_iou
+  is shifted. An ID swap is a match whose ID in one output is matched to another ID of the other output than in
+  the last frame where it was matched. The report is kept as structured arrays of frames, events and IDs.
+  """
+
+    def __init__(self, iou_threshold=0.3, shift_iou=0.9):
+        self.iou_threshold = iou_threshold
+        self.shift_iou = shift_iou
+        self.frames = []
+        self.events = []
+        # every box of both outputs: frame, ID, matched, shifted and ID of its match (-1 if not matched)
+        self.boxes = [[], []]
+        # every match: frame, ID of the first output, ID of the second output, box of the second output
+        self.matches = []
+
+    def update(self, frame, boxes1, ids1, boxes2, ids2):
+        """
+    Compares the boxes [[x1,y1,x2,y2,...],...] of frame of the two outputs with their IDs
+    Returns (K,2) matched indexes and their IoU, e.g. to draw the difference
+    """
+        boxes1 = calculate_cost.as_boxes(boxes1)
+        boxes2 = calculate_cost.as_boxes(boxes2)
+        ids1 = np.asarray(ids1, dtype=int).reshape(-1)
+        ids2 = np.asarray(ids2, dtype=int).reshape(-1)
+        matches, ious = match_frame(boxes1, boxes2, self.iou_threshold)
+        matched1 = np.zeros(len(boxes1), dtype=bool)
+        matched2 = np.zeros(len(boxes2), dtype=bool)
+        matched1[matches[:, 0]] = True
+        matched2[matches[:, 1]] = True
+        shifted = ious < self.shift_iou
+        m1, m2 = matches[:, 0], matches[:, 1]
+
+        partner1 = np.full(len(boxes1), -1)
+        partner1[m1] = ids2[m2]
+        partner2 = np.full(len(boxes2), -1)
+        partner2[m2] = ids1[m1]
+        shifted1 = np.zeros(len(boxes1), dtype=bool)
+        shifted1[m1[shifted]] = True
+        shifted2 = np.zeros(len(boxes2), dtype=bool)
+        shifted2[m2[shifted]] = True
+        self.boxes[0].append((np.full(len(boxes1), frame), ids1, matched1, shifted1, partner1))
+        self.boxes[1].append((np.full(len(boxes2), frame), ids2, matched2, shifted2, partner2))
+        self.matches.append((np.full(len(matches), frame), ids1[m1], ids2[m2], ious, boxes2[m2, 0:4]))
+
+        dropped = ~matched1
+        added = ~matched2
+        self.events.append(box_events(frame, 'dropped', boxes1[dropped], ids1[dropped], -1, 0.))
+        self.events.append(box_events(frame, 'added', boxes2[added], -1, ids2[added], 0.))
+        self.events.append(box_events(frame, 'shifted', boxes2[m2[shifted], 0:4], ids1[m1[shifted]],
+                                      ids2[m2[shifted]], ious[shifted]))
+        self.frames.append((frame, len(boxes1), len(boxes2), len(matches), int(added.sum()), int(dropped.sum()),
+                            int(shifted.sum()), 0, ious.mean() if len(ious) > 0 else 0.))
+        return matches, ious
+
+    def id_swaps(self):
+        """
+    Returns a mask of the matches (in the order they were added) that are ID swaps
+    """
+        frames, id1, id2 = [np.concatenate([m[c] for m in self.matches]) for c in range(3)]
+        swap = np.zeros(len(frames), dtype=bool)
+        for key, partner in ((id1, id2), (id2, id1)):
+            # matches of every ID in frame order, a swap when the partner ID differs from the last match
+            order = np.lexsort((frames, key))
+            same = key[order][1:] == key[order][:-1]
+            swap[order[1:][same & (partner[order][1:] != partner[order][:-1])]] = True
+        return swap
+
+    def report(self):
+        """
+    Returns (frames, events, ids) structured arrays of the frames seen so far
+      frames - counts of every frame (frame_dtype)
+      events - added, dropped and shifted boxes and ID swaps, sorted by frame (event_dtype)
+      ids - counts of every ID of the first (output 1) and the second output (output 2) (id_dtype)
+    """
+        frames = np.array(self.frames, dtype=frame_dtype)
+        events = [np.zeros(0, dtype=event_dtype)] + self.events
+        ids = [np.zeros(0, dtype=id_dtype)]
+        if len(self.matches) > 0:
+            swap = self.id_swaps()
+            m_frames, m_id1, m_id2, m_iou, m_boxes = [np.concatenate([m[c] for m in self.matches])
+                                                      for c in range(5)]
+            events.append(box_events(m_frames[swap], 'swap', m_boxes[swap], m_id1[swap], m_id2[swap], m_iou[swap]))
+            frame_row = np.searchsorted(frames['frame'], m_frames[swap])
+            np.add.at(frames['id_swaps'], frame_row, 1)
+            for output, key, partner in ((1, m_id1, m_id2), (2, m_id2, m_id1)):
+                b_frames, b_ids, matched, shifted, b_partner = [np.concatenate([b[c] for b in self.boxes[output - 1]])
+                                                                for c in range(5)]
+                unique, index = np.unique(b_ids, return_inverse=True)
+                table = np.zeros(len(unique), dtype=id_dtype)
+                table['output'] = output
+                table['id'] = unique
+                table['frames'] = np.bincount(index, minlength=len(unique))
+                table['matched'] = np.bincount(index, weights=matched, minlength=len(unique))
+                table['unmatched'] = table['frames'] - table['matched']
+                table['shifted'] = np.bincount(index, weights=shifted, minlength=len(unique))
+                table['id_swaps'] = np.bincount(np.searchsorted(unique, key[swap]), minlength=len(unique))
+                # number of different IDs of the other output that every ID is matched to
+                pairs = np.unique(np.stack((key, partner), axis=1), axis=0)
+                table['partners'] = np.bincount(np.searchsorted(unique, pairs[:, 0]), minlength=len(unique))
+                ids.append(table)
+        events = np.concatenate(events)
+        events = events[np.argsort(events['frame'], kind='stable')]
+        return frames, events, np.concatenate(ids)
+
+    def summary(self):
+        """
+    Returns the totals of the frames seen so far as a dict
+    """
+        frames = self.report()[0]
+        summary = dict((name, int(frames[name].sum()))
+                       for name in ('boxes1', 'boxes2', 'matched', 'added', 'dropped', 'shifted', 'id_swaps'))
+        summary['frames'] = len(frames)
+        summary['changed_frames'] = int(np.sum((frames['added'] > 0) | (frames['dropped'] > 0) |
+                                               (frames['shifted'] > 0) | (frames['id_swaps'] > 0)))
+        return summary
+
+    def save(self, path):
+        """
+    Saves the report as a .npz file of the structured arrays frames, events and ids
+    """
+        frames, events, ids = self.report()
+        np.savez(path, frames=frames, events=events, ids=ids)
+
+
+def compare_outputs(path1, path2, iou_threshold=0.3, shift_iou=0.9):
+    """
+  Loads two output files of a sequence in motchallenge format once and compares all of their frames
+  Returns the OutputDiff
+  """
+    source1 = mot_source.load_mot(path1)
+    source2 = mot_source.load_mot(path2)
+    diff = OutputDiff(iou_threshold, shift_iou)
+    for frame in range(1, max(source1.last_frame, source2.last_frame) + 1):
+        diff.update(frame, source1[frame], source1.frame_ids(frame), source2[frame], source2.frame_ids(frame))
+    return diff
+
+
+def format_summary(summary):
+    """
+  Returns a one line report of the totals of a summary
+  """
+    return ('frames: %d (changed %d), boxes: %d / %d, matched: %d, added: %d, dropped: %d, shifted: %d, '
+            'ID swaps: %d' % (summary['frames'], summary['changed_frames'], summary['boxes1'], summary['boxes2'],
+                              summary['matched'], summary['added'], summary['dropped'], summary['shifted'],
+                              summary['id_swaps']))
@@ -0,0 +1,92 @@
+from __future__ import print_function
+import json
+import time
+import numpy as np
+
+
+class StageProfiler(object):
+    """
+  This class records the time of every stage of Sort_OH.update and some counters for every frame.
+  It is opt-in: Sort_OH.profiler is None by default and then no stage is timed.
+  Stages are timed by laps: start() returns the start time of the frame, and lap(stage, t) adds
+  the time from t to now to stage and returns now as the start time of the next stage.
+  """
+    stages = ['predict', 'outside', 'cost_matrix', 'hungarian', 'extended', 'ios_matrix', 'occlusion', 'gt_diff',
+              'kalman_update', 'new_trackers', 'deletion', 'total']
+    counters = ['tracks', 'detections', 'occluded']
+
+    def __init__(self):
+        self.records = []
+        self.frame = None
+        self.frame_start = 0.
+
+    def start(self):
+        self.frame = {}
+        self.frame_start = time.perf_counter()
+        return self.frame_start
+
+    def tic(self):
+        return time.perf_counter()
+
+    def lap(self, stage, t):
+        now = time.perf_counter()
+        self.frame[stage] = self.frame.get(stage, 0.) + now - t
+        return now
+
+    def count(self, name, value):
+        self.frame[name] = value
+
+    def stop(self):
+        self.frame['total'] = time.perf_counter() - self.frame_start
+        self.records.append(self.frame)
+        self.frame = None
+
+    def column(self, name):
+        """
+    Returns values of a stage or counter for every frame, frames in which a stage is not run have zero time
+    """
+        return np.array([r.get(name, 0.) for r in self.records], dtype=np.float64)
+
+    def summary(self):
+        """
+    Returns a dict of p50/p95/p99/mean/max latency in milliseconds of every stage and of every counter
+    """
+        summary = {'frames': len(self.records), 'stages': {}, 'counters': {}}
+        if len(self.records) == 0:
+            return summary
+        for stage in self.stages:
+            values = self.column(stage) * 1000.
+            summary['stages'][stage] = stats(values)
+        for name in self.counters:
+            summary['counters'][name] = stats(self.column(name))
+        return summary
+
+    def save(self, path):
+        """
+    Saves summary() to path, as JSON if path ends with .json and otherwise as CSV
+    """
+        summary = self.summary()
+        with open(path, 'w') as f:
+            if path.endswith('.json'):
+                json.dump(summary, f, indent=2)
+            else:
+                print('name,kind,p50,p95,p99,mean,max', file=f)
+                for kind in ('stages', 'counters'):
+                    for name, s in summary[kind].items():
+                        print('%s,%s,%.6f,%.6f,%.6f,%.6f,%.6f' % (name, kind[:-1], s['p50'], s['p95'], s['p99'],
+                                                                s['mean'], s['max']), file=f)
+
+    def save_frames(self, path):
+        """
+    Saves stage times in milliseconds and counters of every frame to path as CSV
+    """
+        names = self.stages + self.counters
+        table = np.stack([self.column(name) * (1000. if name in self.stages else 1.) for name in names], axis=1) \
+            if len(self.records) > 0 else np.empty((0, len(names)))
+        np.savetxt(path, table, delimiter=',', fmt='%.6f', header=','.join(names), comments='')
+
+
+def stats(values):
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'mean': float(values.mean()),
+            'max': float(values.max())}
@@ -0,0 +1,112 @@
+import os.path
+import numpy as np
+
+
+class TextSink(object):
+    """
+  This class writes the targets of every frame to a MOTChallenge text file, the same lines as formatting every
+  target with print(). Targets of frames are kept as arrays and are formatted and written in blocks of
+  buffer_rows rows: the width and height of all rows are computed at once and a block is formatted with one
+  format operation on Python floats, which is much faster than formatting NumPy scalars row by row.
+  """
+    line = '%d,%d,%.2f,%.2f,%.2f,%.2f,1,-1,-1,-1\n'
+
+    def __init__(self, path, buffer_rows=4096):
+        self.path = path
+        self.buffer_rows = buffer_rows
+        self.file = open(path, 'w')
+        self.blocks = []
+        self.rows = 0
+
+    def write(self, frame, trackers):
+        """
+    Adds the targets of frame in the format [[x1,y1,x2,y2,id],...]
+    """
+        if len(trackers) == 0:
+            return
+        block = np.empty((len(trackers), 6))
+        block[:, 0] = frame
+        block[:, 1] = trackers[:, 4]
+        block[:, 2:4] = trackers[:, 0:2]
+        block[:, 4:6] = trackers[:, 2:4] - trackers[:, 0:2]  # convert [x1,y1,x2,y2] to [x1,y1,w,h]
+        self.blocks.append(block)
+        self.rows += len(block)
+        if self.rows >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        if self.rows > 0:
+            self.file.write((self.line * self.rows) % tuple(np.concatenate(self.blocks).ravel().tolist()))
+            self.blocks = []
+            self.rows = 0
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class NpySink(object):
+    """
+  This class writes the targets of all frames to a binary .npy file of (N,7) rows
+  [frame, x1, y1, x2, y2, score, id] sorted by frame, the layout of the cache of mot_source.py.
+  The file is memory-mapped by mot_source.load_mot() without parsing, and keeps the full precision of the boxes.
+  """
+    def __init__(self, path):
+        self.path = path
+        self.blocks = []
+
+    def write(self, frame, trackers):
+        """
+    Adds the targets of frame in the format [[x1,y1,x2,y2,id],...]
+    """
+        if len(trackers) == 0:
+            return
+        block = np.empty((len(trackers), 7))
+        block[:, 0] = frame
+        block[:, 1:5] = trackers[:, 0:4]
+        block[:, 5] = 1
+        block[:, 6] = trackers[:, 4]
+        self.blocks.append(block)
+
+    def close(self):
+        data = np.concatenate(self.blocks) if len(self.blocks) > 0 else np.zeros((0, 7))
+        # write to a temporary file and rename it, so a reader never sees a partial file
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp, 'wb') as f:
+            np.save(f, data)
+        os.replace(tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# output formats: file extension and sink
+sinks = {'txt': ('.txt', TextSink), 'npy': ('.npy', NpySink)}
+
+
+def open_sink(folder, seq, output_format='txt'):
+    """
+  Returns a sink that writes the targets of seq to folder/<seq>.txt or folder/<seq>.npy
+  """
+    ext, sink = sinks[output_format]
+    return sink('%s/%s%s' % (folder, seq, ext))
+
+
+def output_path(folder, seq):
+    """
+  Returns the path of the output of seq in folder, the binary file if there is one, otherwise the text file
+  """
+    path = '%s/%s.npy' % (folder, seq)
+    if os.path.exists(path):
+        return path
+    return '%s/%s.txt' % (folder, seq)
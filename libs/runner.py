@@ -0,0 +1,161 @@
+from __future__ import print_function
+import os.path
+import time
+import functools
+import multiprocessing
+from tqdm import tqdm
+from . import visualization
+from . import tracker
+from . import kalman_tracker
+from . import mot_source
+from . import evaluation
+from . import profiling
+from . import frame_source
+from . import results_sink
+
+
+def load_sequence(seq, mot_path, phase, cache=False, cache_dir=None):
+    """
+  Loads detections and (in train phase) ground truths of a sequence
+  Returns (detections, ground truths), ground truths are None in test phase
+  """
+    common_path = ('%s/%s/%s' % (mot_path, phase, seq))
+    # load detections
+    seq_dets = mot_source.load_mot('%s/det/det.txt' % common_path, min_score=0.3, cache=cache, cache_dir=cache_dir)
+    seq_gts = None
+    if phase == 'train':
+        # load ground truth
+        seq_gts = mot_source.load_mot('%s/gt/gt.txt' % common_path, cache=cache, cache_dir=cache_dir)
+    return seq_dets, seq_gts
+
+
+def run_sequence(seq, mot_path, phase, outFolder, imgFolder, conf_trgt, conf_objt, cache=False, progress=True,
+                 params=None, sources=None, evaluate=False, profile=False, render_workers=2, video=False,
+                 save_images=True, render_scale=1., output_format='txt', display_state=None):
+    """
+  Tracks one MOTChallenge sequence and writes the tracks to outFolder/<seq>.txt
+  or with output_format 'npy' to the binary file outFolder/<seq>.npy (see results_sink.py)
+  params is an optional dict of other parameters of Sort_OH: max_age, min_hits, iou_threshold, ios_threshold and
+  birth_frames
+  sources is an optional dict of already loaded (detections, ground truths) of sequences by load_sequence()
+  If evaluate is True (only in train phase), MOT metrics of the tracks are computed while tracking
+  If profile is True, time of every stage of the tracker is recorded and p50/p95/p99 latencies are saved to
+  outFolder/<seq>_profile.json and stage times of every frame to outFolder/<seq>_profile_frames.csv
+  If display is on, frames are rendered by render_workers background workers (0: in the tracking loop).
+  They are saved as images in imgFolder if save_images is True and written to imgFolder/Video_<seq>.avi if
+  video is True. Images are read ahead on background threads and decoded at render_scale of their size
+  display_state is the dict of display toggles and backend of visualization.display_state(), by default the current
+  DisplayState. It is given explicitly, because spawned worker processes do not see DisplayState changed in the
+  main process
+  Returns (seq, tracking time, number of frames, metrics), metrics is None if it is not evaluated
+  """
+    params = params or {}
+    kalman_tracker.KalmanBoxTracker.count = 0   # Make zero ID number in the new sequence
+    # create instance of the SORT with occlusion handling tracker
+    mot_tracker = tracker.Sort_OH(max_age=params.get('max_age', 3), min_hits=params.get('min_hits', 3),
+                                  birth_frames=params.get('birth_frames', 3))
+    mot_tracker.seq = seq
+    mot_tracker.conf_trgt = conf_trgt
+    mot_tracker.conf_objt = conf_objt
+    mot_tracker.iou_threshold = params.get('iou_threshold', mot_tracker.iou_threshold)
+    mot_tracker.ios_threshold = params.get('ios_threshold', mot_tracker.ios_threshold)
+    state = display_state or visualization.display_state()
+    mot_tracker.gt_diff = state['display_gt_diff']
+    common_path = ('%s/%s/%s' % (mot_path, phase, seq))
+    if sources is not None and seq in sources:
+        seq_dets, seq_gts = sources[seq]
+    else:
+        seq_dets, seq_gts = load_sequence(seq, mot_path, phase, cache)
+    if evaluate and seq_gts is not None:
+        mot_tracker.evaluator = evaluation.MOTEvaluator()
+    if profile:
+        mot_tracker.profiler = profiling.StageProfiler()
+
+    total_time = 0.0
+    total_frames = 0
+    with results_sink.open_sink(outFolder, seq, output_format) as out_file:
+        if progress:
+            print("\nProcessing %s." % seq)
+
+        if state['display'] and not os.path.exists('%s/%s' % (common_path, imgFolder)):
+            os.makedirs('%s/%s' % (common_path, imgFolder))
+        reader = None
+        if state['display']:
+            reader = frame_source.FrameReader(common_path, 'bgr' if state['backend'] == 'opencv'
+                                              else 'rgb', render_scale, last_frame=seq_dets.last_frame)
+        # the render workers and the prefetch threads of the reader are stopped even if tracking fails
+        try:
+            renderer = visualization.RenderPipeline(workers=render_workers, save_images=save_images,
+                                                    video='%s/%s/Video_%s.avi' % (common_path, imgFolder, seq) if video
+                                                    else None, reader=reader, state=state)
+            try:
+                # detections with low confidence are already removed and boxes are in [x1,y1,x2,y2] format
+                for frame, dets in tqdm(seq_dets, total=len(seq_dets), disable=not progress):
+                    gts = []
+                    gt_ids = None
+                    if phase == 'train':
+                        gts = seq_gts[frame]
+                        gt_ids = seq_gts.frame_ids(frame)
+                    total_frames += 1
+
+                    start_time = time.time()
+                    trackers, unmatched_trckr, unmatched_gts = mot_tracker.update(dets, gts, gt_ids)
+                    cycle_time = time.time() - start_time
+                    total_time += cycle_time
+
+                    # save trackers -> Frame number, ID, Left, Top, Width, Height
+                    out_file.write(frame, trackers)
+
+                    renderer.submit(common_path, imgFolder, frame, dets, gts, trackers, unmatched_trckr, unmatched_gts,
+                                    mot_tracker.trackers)
+            finally:
+                renderer.close()
+        finally:
+            if reader is not None:
+                reader.close()
+    if mot_tracker.profiler is not None:
+        mot_tracker.profiler.save('%s/%s_profile.json' % (outFolder, seq))
+        mot_tracker.profiler.save_frames('%s/%s_profile_frames.csv' % (outFolder, seq))
+    metrics = None
+    if mot_tracker.evaluator is not None:
+        metrics = mot_tracker.evaluator.summary()
+    return seq, total_time, total_frames, metrics
+
+
+def run_sequences(sequences, workers=1, **kwargs):
+    """
+  Runs run_sequence() for every sequence, in a pool of worker processes if workers > 1
+  Every process has its own KalmanBoxTracker.count, and it is reset for every sequence, so the outputs
+  are the same as running the sequences one after another.
+  Returns the list of (seq, tracking time, number of frames, metrics) in the order of sequences
+  """
+    if workers <= 1:
+        return [run_sequence(seq, **kwargs) for seq in sequences]
+    kwargs['progress'] = False  # progress bars of several processes would overwrite each other
+    pool = multiprocessing.Pool(processes=min(workers, len(sequences)))
+    try:
+        return pool.map(functools.partial(run_sequence, **kwargs), sequences, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def write_summary(path, results):
+    """
+  Writes total and per-sequence tracking time (and metrics if evaluated) of results of run_sequences() to path
+  Returns the line of total tracking time, followed by the line of total metrics if evaluated
+  """
+    total_time = sum(r[1] for r in results)
+    total_frames = sum(r[2] for r in results)
+    total = "Total Tracking took: %.3f for %d frames or %.1f FPS" % (total_time, total_frames, total_frames / total_time)
+    metrics = [r[3] for r in results if r[3] is not None]
+    if len(metrics) > 0:
+        total += "\n" + evaluation.format_summary(evaluation.merge_summaries(metrics))
+    with open(path, 'w') as sum_file:
+        print(total, file=sum_file)
+        for seq, seq_time, seq_frames, seq_metrics in results:
+            line = "%s: %.3f for %d frames or %.1f FPS" % (seq, seq_time, seq_frames, seq_frames / seq_time)
+            if seq_metrics is not None:
+                line += ", " + evaluation.format_summary(seq_metrics)
+            print(line, file=sum_file)
+    return total
@@ -0,0 +1,336 @@
+import sys
+import json
+import struct
+import asyncio
+import concurrent.futures
+import numpy as np
+from . import tracker
+from . import snapshot
+
+
+class TrackerSession(object):
+    """
+  This class keeps the tracker of one camera stream.
+  Every session counts the IDs of its targets itself instead of the global KalmanBoxTracker.count,
+  so many cameras can be tracked in one process and IDs of a camera do not depend on the others.
+  """
+    def __init__(self, camera, conf_trgt=0.35, conf_objt=0.75, scene=None, params=None):
+        params = params or {}
+        self.camera = camera
+        self.tracker = tracker.Sort_OH(max_age=params.get('max_age', 3), min_hits=params.get('min_hits', 3),
+                                       batched=params.get('batched', False), gated=params.get('gated', False),
+                                       birth_frames=params.get('birth_frames', 3))
+        self.tracker.seq = camera
+        self.tracker.conf_trgt = conf_trgt
+        self.tracker.conf_objt = conf_objt
+        self.tracker.iou_threshold = params.get('iou_threshold', self.tracker.iou_threshold)
+        self.tracker.ios_threshold = params.get('ios_threshold', self.tracker.ios_threshold)
+        self.tracker.scene = scene
+        self.tracker.next_id = 0
+        self.frames = 0
+
+    def step(self, dets):
+        """
+    Tracks one frame of detections in the format [[x1,y1,x2,y2,score],...]
+    Returns the targets of the frame in the format [[x1,y1,x2,y2,id],...]
+    """
+        self.frames += 1
+        trackers, unmatched_trckr, unmatched_gts = self.tracker.update(dets, [])
+        # a degenerate box gives a target without a finite location, it can not be reported
+        return trackers[np.all(np.isfinite(trackers), axis=1)]
+
+    def snapshot(self):
+        """
+    Returns the snapshot of the tracker of the session as bytes (see snapshot.py)
+    """
+        return snapshot.dumps(self.tracker)
+
+    def restore(self, data):
+        """
+    Replaces the tracker with the tracker of a snapshot, e.g. of the session of a process that stopped,
+    so the camera goes on with the same targets and IDs
+    """
+        self.tracker = snapshot.loads(data)
+        self.frames = self.tracker.frame_count
+
+
+class Message(object):
+    """
+  One frame of detections of a camera, or the end of the stream of a camera if end is True
+  error is the reason why a message is invalid, then it is answered with an error record and not tracked
+  """
+    def __init__(self, camera, frame, dets, end=False, scene=None, error=None):
+        self.camera = camera
+        self.frame = frame
+        self.dets = dets
+        self.end = end
+        self.scene = scene
+        self.error = error
+
+
+def check_dets(dets):
+    """
+  Returns the reason why detections of a message can not be tracked, or None if they are valid
+  """
+    if dets.ndim != 2 or dets.shape[1] != 5:
+        return 'detections must be rows of [x1,y1,x2,y2,score], not of shape %s' % (dets.shape,)
+    if not np.all(np.isfinite(dets)):
+        return 'detections must be finite'
+    return None
+
+
+class JsonLineCodec(object):
+    """
+  Messages are JSON objects, one per line:
+    request:  {"camera": "cam1", "frame": 12, "dets": [[x1,y1,x2,y2,score],...]}
+              {"camera": "cam1", "end": true} ends the session of the camera
+              "scene": [width, height] can be given in the first message of a camera
+    response: {"camera": "cam1", "frame": 12, "tracks": [[x1,y1,x2,y2,id],...]}
+              {"camera": "cam1", "frame": 12, "error": "..."} if the message is invalid or its tracking failed,
+              camera and frame are null if they can not be read from the message
+  """
+    async def read(self, reader):
+        """
+    Returns the next message, or None at the end of the input
+    """
+        while True:
+            line = await reader.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if line:
+                break
+        try:
+            msg = json.loads(line)
+        except ValueError as e:
+            return Message(None, None, None, error='invalid JSON: %s' % e)
+        if not isinstance(msg, dict) or 'camera' not in msg:
+            return Message(None, None, None, error='a message must be a JSON object with a camera')
+        camera = str(msg['camera'])
+        frame = msg.get('frame', 0)
+        if not isinstance(frame, int):
+            return Message(camera, None, None, error='frame must be an integer')
+        try:
+            dets = np.asarray(msg.get('dets', []), dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            return Message(camera, frame, None, error='invalid detections: %s' % e)
+        if dets.size == 0:
+            dets = dets.reshape(0, 5)
+        return Message(camera, frame, dets, msg.get('end', False), msg.get('scene'), check_dets(dets))
+
+    def encode(self, camera, frame, tracks):
+        tracks = [[round(float(v), 2) for v in d[0:4]] + [int(d[4])] for d in tracks]
+        return (json.dumps({'camera': camera, 'frame': frame, 'tracks': tracks}) + '\n').encode('utf-8')
+
+    def encode_error(self, camera, frame, error):
+        return (json.dumps({'camera': camera, 'frame': frame, 'error': error}) + '\n').encode('utf-8')
+
+
+class BinaryCodec(object):
+    """
+  Messages are a little-endian header (camera name length: uint16, frame: uint32, number of boxes: uint32),
+  followed by the camera name in UTF-8 and the boxes as float64 rows:
+    request:  rows of [x1,y1,x2,y2,score], number of boxes 0xFFFFFFFF ends the session of the camera
+    response: rows of [x1,y1,x2,y2,id], or if the message is invalid or its tracking failed, number of boxes
+              0xFFFFFFFE followed by the length of the error (uint32) and the error in UTF-8
+  """
+    header = struct.Struct('<HII')
+    length = struct.Struct('<I')
+    end = 0xFFFFFFFF
+    error = 0xFFFFFFFE
+
+    async def read(self, reader):
+        try:
+            name_len, frame, num = self.header.unpack(await reader.readexactly(self.header.size))
+            camera = await reader.readexactly(name_len)
+            if num == self.end:
+                return Message(camera.decode('utf-8', 'replace'), frame, None, True)
+            dets = np.frombuffer(await reader.readexactly(num * 5 * 8), dtype='<f8').reshape(num, 5)
+        except asyncio.IncompleteReadError:
+            return None
+        # the message is read to its end even when it is invalid, so the next message can be read
+        try:
+            camera = camera.decode('utf-8')
+        except UnicodeDecodeError:
+            return Message(None, frame, None, error='camera name is not UTF-8')
+        return Message(camera, frame, dets, error=check_dets(dets))
+
+    def encode(self, camera, frame, tracks):
+        name = camera.encode('utf-8')
+        tracks = np.ascontiguousarray(tracks, dtype='<f8').reshape(-1, 5)
+        return self.header.pack(len(name), frame, len(tracks)) + name + tracks.tobytes()
+
+    def encode_error(self, camera, frame, error):
+        name = (camera or '').encode('utf-8')
+        error = error.encode('utf-8')
+        return self.header.pack(len(name), frame or 0, self.error) + name + self.length.pack(len(error)) + error
+
+
+class FileReader(object):
+    """
+  Reads a blocking file (stdin) in the default executor with the reading methods of asyncio.StreamReader
+  """
+    def __init__(self, f):
+        self.f = f
+
+    async def readline(self):
+        return await asyncio.get_running_loop().run_in_executor(None, self.f.readline)
+
+    async def readexactly(self, n):
+        data = await asyncio.get_running_loop().run_in_executor(None, self.f.read, n)
+        if len(data) < n:
+            raise asyncio.IncompleteReadError(data, n)
+        return data
+
+
+class FileWriter(object):
+    """
+  Writes to a blocking file (stdout) with the writing methods of asyncio.StreamWriter
+  """
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, data):
+        self.f.write(data)
+
+    async def drain(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.flush()
+
+
+class TrackerService(object):
+    """
+  This class runs a tracker session for every camera in one process.
+  Messages are read from streams and put in a bounded queue of their camera. Every camera has a task that
+  tracks the frames of its queue in order and writes the targets back to the stream the frame came from.
+  Frames are tracked in a pool of worker threads, one frame of a camera at a time, so a heavy frame does not
+  stall reading, writing and the other cameras on the event loop.
+  When the queue of a camera is full, reading from the stream waits, so a fast producer is slowed down
+  to the speed of the tracker instead of filling the memory (backpressure). Cameras are tracked concurrently,
+  but the backpressure is per stream: while the queue of a slow camera is full, the other cameras of the same
+  stream are not read either. Cameras sent on separate streams (connections) do not wait for each other.
+  An invalid message or a frame whose tracking fails is answered with an error record, the others go on.
+  When a stream ends, the sessions of its cameras are closed.
+  """
+    def __init__(self, codec, conf_trgt=0.35, conf_objt=0.75, params=None, queue_size=8, workers=None):
+        self.codec = codec
+        # threads mostly wait for the GIL, more threads than CPUs keep a heavy frame from taking all of them
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self.conf_trgt = conf_trgt
+        self.conf_objt = conf_objt
+        self.params = params
+        self.queue_size = queue_size
+        self.sessions = {}
+        self.queues = {}
+        self.tasks = set()
+        self.camera_tasks = {}
+
+    async def submit(self, msg, writer):
+        """
+    Puts a message in the queue of its camera, waiting while the queue is full
+    Returns (queue, task), the queue and the task that tracks it
+    """
+        queue = self.queues.get(msg.camera)
+        task = self.camera_tasks.get(msg.camera)
+        if queue is None:
+            session = TrackerSession(msg.camera, self.conf_trgt, self.conf_objt, msg.scene, self.params)
+            queue = asyncio.Queue(maxsize=self.queue_size)
+            self.sessions[msg.camera] = session
+            self.queues[msg.camera] = queue
+            task = asyncio.ensure_future(self.run_camera(session, queue))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+            self.camera_tasks[msg.camera] = task
+        if msg.end:
+            # later frames of the camera begin a new session
+            self.close_session(msg.camera)
+        await queue.put((msg, writer))
+        return queue, task
+
+    def close_session(self, camera):
+        del self.sessions[camera]
+        del self.queues[camera]
+        del self.camera_tasks[camera]
+
+    async def run_camera(self, session, queue):
+        """
+    Tracks the frames of a camera until its stream is ended
+    """
+        loop = asyncio.get_running_loop()
+        while True:
+            msg, writer = await queue.get()
+            try:
+                if msg.end:
+                    break
+                try:
+                    # the next frame of the camera is taken from the queue after this one is tracked
+                    tracks = await loop.run_in_executor(self.executor, session.step, msg.dets)
+                    data = self.codec.encode(session.camera, msg.frame, tracks)
+                except Exception as e:
+                    # the frame is not tracked, the session goes on with the next frame
+                    data = self.codec.encode_error(session.camera, msg.frame, 'tracking failed: %r' % e)
+                try:
+                    writer.write(data)
+                    await writer.drain()
+                except ConnectionError:
+                    pass    # the stream of the frame is closed, later frames may come on another stream
+            finally:
+                queue.task_done()
+
+    async def serve_stream(self, reader, writer):
+        """
+    Reads messages from a stream until its end and waits until all of its frames are tracked
+    """
+        cameras = set()
+        while True:
+            msg = await self.codec.read(reader)
+            if msg is None:
+                break
+            if msg.error is not None:
+                writer.write(self.codec.encode_error(msg.camera, msg.frame, msg.error))
+                await writer.drain()
+                continue
+            queue, task = await self.submit(msg, writer)
+            cameras.add((msg.camera, queue, task))
+        for camera, queue, task in cameras:
+            await queue.join()
+        # end the sessions of the cameras that are not ended by their last message, after their queued frames
+        for camera, queue, task in cameras:
+            if self.queues.get(camera) is queue:
+                self.close_session(camera)
+                await queue.put((Message(camera, None, None, True), writer))
+        await asyncio.gather(*[task for camera, queue, task in cameras], return_exceptions=True)
+        writer.close()
+
+    async def serve_stdio(self):
+        """
+    Serves stdin and writes the targets to stdout
+    """
+        try:
+            await self.serve_stream(FileReader(sys.stdin.buffer), FileWriter(sys.stdout.buffer))
+        finally:
+            self.executor.shutdown()
+
+    async def serve_tcp(self, host, port):
+        """
+    Serves every connection of a TCP socket until the process is stopped
+    """
+        server = await asyncio.start_server(self.serve_stream, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown()
+
+    async def serve_unix(self, path):
+        """
+    Serves every connection of a unix socket until the process is stopped
+    """
+        server = await asyncio.start_unix_server(self.serve_stream, path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown()
@@ -0,0 +1,137 @@
+import os
+import json
+import struct
+import numpy as np
+from . import tracker
+from . import track_table
+from . import kalman_tracker
+
+
+# A snapshot is a little-endian header (magic b'SOHS', version: uint16, length of the metadata: uint32), followed by
+# the metadata in UTF-8 JSON (parameters, counters and the dtype and shape of every array) and the arrays as raw
+# little-endian bytes in the order of the metadata. The states (N,7) and covariances (N,7,7) of the Kalman filters
+# of all targets are packed in two flat arrays, the bookkeeping of targets is the structured array of their table.
+magic = b'SOHS'
+version = 1
+header = struct.Struct('<4sHI')
+
+# attributes of Sort_OH saved in the metadata
+attributes = ('max_age', 'min_hits', 'batched', 'gated', 'frame_count', 'seq', 'conf_trgt', 'conf_objt',
+              'iou_threshold', 'ios_threshold', 'next_id', 'scene', 'gt_diff')
+
+
+def json_value(value):
+    """
+  Converts NumPy scalars and arrays of an attribute to Python values
+  """
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return value
+
+
+def dumps(mot_tracker):
+    """
+  Returns the snapshot of a Sort_OH tracker as bytes
+  """
+    trackers = mot_tracker.trackers
+    n = len(trackers)
+    if mot_tracker.batched:
+        x = trackers.x.reshape(n, 7)
+        P = trackers.P
+    else:
+        x = np.array([trk.kf.x.reshape(7) for trk in trackers]).reshape(n, 7)
+        P = np.array([trk.kf.P for trk in trackers]).reshape(n, 7, 7)
+    birth = mot_tracker.birth
+    arrays = [('rec', trackers.rec),
+              ('x', x),
+              ('P', P),
+              ('area_avg', np.array([np.ravel(a)[0] for a in mot_tracker.area_avg_array], dtype=np.float64)),
+              ('birth_boxes', birth.boxes),
+              ('birth_boxes_before', birth.boxes_before),
+              ('birth_scores', birth.scores),
+              ('birth_frames', birth.frames.astype(np.int64))]
+    meta = dict((name, json_value(getattr(mot_tracker, name))) for name in attributes)
+    meta['count'] = kalman_tracker.KalmanBoxTracker.count
+    meta['birth'] = {'length': birth.length, 'min_score': birth.min_score, 'iou_threshold': birth.iou_threshold}
+    meta['arrays'] = []
+    blocks = []
+    for name, array in arrays:
+        array = np.ascontiguousarray(array, dtype=np.dtype(array.dtype).newbyteorder('<'))
+        meta['arrays'].append([name, np.lib.format.dtype_to_descr(array.dtype), list(array.shape)])
+        blocks.append(array.tobytes())
+    meta = json.dumps(meta).encode('utf-8')
+    return b''.join([header.pack(magic, version, len(meta)), meta] + blocks)
+
+
+def loads(data):
+    """
+  Returns a new Sort_OH tracker restored from a snapshot, which tracks the next frames as the saved tracker
+  would have. If the saved tracker counted IDs with the global counter, KalmanBoxTracker.count is restored, too.
+  The evaluator and profiler of a tracker are not saved.
+  """
+    data = memoryview(data)
+    mark, ver, meta_len = header.unpack_from(data)
+    if mark != magic:
+        raise ValueError('not a tracker snapshot')
+    if ver != version:
+        raise ValueError('unsupported snapshot version %d' % ver)
+    offset = header.size
+    meta = json.loads(bytes(data[offset:offset + meta_len]).decode('utf-8'))
+    offset += meta_len
+    arrays = {}
+    for name, descr, shape in meta['arrays']:
+        dtype = np.lib.format.descr_to_dtype(descr)
+        count = int(np.prod(shape))
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape).copy()
+        offset += count * dtype.itemsize
+
+    birth = meta['birth']
+    mot_tracker = tracker.Sort_OH(max_age=meta['max_age'], min_hits=meta['min_hits'], batched=meta['batched'],
+                                  gated=meta['gated'], birth_frames=birth['length'])
+    for name in attributes:
+        setattr(mot_tracker, name, meta[name])
+    if mot_tracker.next_id is None:
+        kalman_tracker.KalmanBoxTracker.count = meta['count']
+    mot_tracker.area_avg_array = arrays['area_avg'].tolist()
+    mot_tracker.birth.min_score = birth['min_score']
+    mot_tracker.birth.iou_threshold = birth['iou_threshold']
+    mot_tracker.birth.boxes = arrays['birth_boxes']
+    mot_tracker.birth.boxes_before = arrays['birth_boxes_before']
+    mot_tracker.birth.scores = arrays['birth_scores']
+    mot_tracker.birth.frames = arrays['birth_frames'].astype(int)
+
+    rec = arrays['rec'].astype(track_table.track_dtype)
+    x = arrays['x']
+    P = arrays['P']
+    n = len(rec)
+    if mot_tracker.batched:
+        mot_tracker.trackers.restore(x, P, rec)
+    else:
+        table = track_table.TrackTable(capacity=max(64, n))
+        for i in range(n):
+            # the filter is created with any box and its state and covariance are replaced
+            trk = kalman_tracker.KalmanBoxTracker(np.array([0., 0., 1., 1.]), 0, None, int(rec['id'][i]))
+            trk.kf.x = x[i].reshape(7, 1).copy()
+            trk.kf.P = P[i].copy()
+            table.append(trk)
+        table.rec[:] = rec
+        mot_tracker.trackers = table
+    return mot_tracker
+
+
+def save(mot_tracker, path):
+    """
+  Writes the snapshot of a tracker to a file, through a temporary file so a reader never sees a partial snapshot
+  """
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(dumps(mot_tracker))
+    os.replace(tmp, path)
+
+
+def load(path):
+    """
+  Returns the tracker restored from the snapshot file of save()
+  """
+    with open(path, 'rb') as f:
+        return loads(f.read())
@@ -0,0 +1,151 @@
+from __future__ import print_function
+import os.path
+import json
+import itertools
+import multiprocessing
+from . import visualization
+from . import runner
+from . import evaluation
+
+
+# parameters that can be swept and their default values
+sweep_defaults = {'max_age': 3, 'min_hits': 3, 'conf_trgt': 0.35, 'conf_objt': 0.75,
+                  'iou_threshold': 0.3, 'ios_threshold': 0.3}
+
+# metrics written to the result file of a sweep (train phase only)
+sweep_metrics = ['mota', 'motp', 'idf1', 'mt', 'ml', 'fp', 'fn', 'idsw', 'frag']
+
+# detections and ground truths of sequences loaded once in every worker process
+worker_sources = {}
+
+
+def grid_points(grid, keep=None):
+    """
+  Returns the list of all combinations of a grid, a dict of parameter name -> list of values
+  Parameters that are not in the grid take their default value. If keep is given, only points
+  for which keep(point) is True are returned.
+  """
+    for name in grid:
+        if name not in sweep_defaults:
+            raise ValueError('unknown sweep parameter %s' % name)
+    names = sorted(grid)
+    points = []
+    for values in itertools.product(*[grid[name] for name in names]):
+        point = dict(sweep_defaults)
+        point.update(zip(names, values))
+        if keep is None or keep(point):
+            points.append(point)
+    return points
+
+
+def point_name(point):
+    """
+  Returns the output folder name of a grid point
+  """
+    return '_'.join('%s_%s' % (name, point[name]) for name in sorted(point))
+
+
+def init_worker(sequences, mot_path, phase, cache_dir):
+    """
+  Loads the detections of all sequences once per worker process. They are memory-mapped from the
+  cache, so the pages are shared read-only between the processes.
+  """
+    for seq in sequences:
+        if seq not in worker_sources:
+            worker_sources[seq] = runner.load_sequence(seq, mot_path, phase, cache=True, cache_dir=cache_dir)
+
+
+def run_point(point, sequences, mot_path, phase, out_root):
+    """
+  Tracks all sequences with the parameters of a grid point and writes outputs to out_root/<point name>
+  In train phase the tracks are evaluated while tracking.
+  When the point is finished, its parameters, timing and metrics are written to point.json, which marks it as done.
+  Returns (point, tracking time, number of frames, metrics), metrics is None in test phase
+  """
+    out_folder = '%s/%s' % (out_root, point_name(point))
+    if not os.path.exists(out_folder):
+        os.makedirs(out_folder)
+    params = dict((name, point[name]) for name in ('max_age', 'min_hits', 'iou_threshold', 'ios_threshold'))
+    results = []
+    for seq in sequences:
+        results.append(runner.run_sequence(seq, mot_path, phase, out_folder, None, point['conf_trgt'],
+                                           point['conf_objt'], progress=False, params=params,
+                                           sources=worker_sources, evaluate=True,
+                                           display_state=dict(visualization.display_state(), display=False)))
+    runner.write_summary('%s/summery_%s.txt' % (out_folder, phase), results)
+    total_time = sum(r[1] for r in results)
+    total_frames = sum(r[2] for r in results)
+    metrics = None
+    if all(r[3] is not None for r in results):
+        metrics = evaluation.merge_summaries([r[3] for r in results])
+    # write the done marker atomically, so an interrupted point is run again on resume
+    tmp = '%s/point.json.%d.tmp' % (out_folder, os.getpid())
+    with open(tmp, 'w') as f:
+        json.dump({'point': point, 'time': total_time, 'frames': total_frames, 'metrics': metrics}, f)
+    os.replace(tmp, '%s/point.json' % out_folder)
+    return point, total_time, total_frames, metrics
+
+
+def finished_point(point, out_root):
+    """
+  Returns (point, tracking time, number of frames, metrics) of a point that is finished before, otherwise None
+  """
+    try:
+        with open('%s/%s/point.json' % (out_root, point_name(point))) as f:
+            done = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return point, done['time'], done['frames'], done.get('metrics')
+
+
+def run_point_star(args):
+    return run_point(*args)
+
+
+def run_sweep(points, sequences, mot_path, phase, out_root, workers=1, cache_dir=None):
+    """
+  Runs all grid points over all sequences in a pool of worker processes
+  Points that are already finished in out_root are skipped, so an interrupted sweep can be resumed.
+  The timing and metrics of every point are written to out_root/sweep_%s.csv % phase
+  Returns the list of (point, tracking time, number of frames, metrics) in the order of points
+  """
+    if not os.path.exists(out_root):
+        os.makedirs(out_root)
+    results = dict((point_name(p), finished_point(p, out_root)) for p in points)
+    todo = [p for p in points if results[point_name(p)] is None]
+    print('%d of %d grid points are already finished' % (len(points) - len(todo), len(points)))
+    if len(todo) > 0:
+        # parse detection files once, then every worker memory-maps the cached arrays
+        for seq in sequences:
+            runner.load_sequence(seq, mot_path, phase, cache=True, cache_dir=cache_dir)
+        tasks = [(p, sequences, mot_path, phase, out_root) for p in todo]
+        initargs = (sequences, mot_path, phase, cache_dir)
+        if workers <= 1:
+            init_worker(*initargs)
+            done = map(run_point_star, tasks)
+        else:
+            pool = multiprocessing.Pool(processes=min(workers, len(todo)), initializer=init_worker,
+                                        initargs=initargs)
+            done = pool.imap_unordered(run_point_star, tasks)
+        try:
+            for i, res in enumerate(done):
+                results[point_name(res[0])] = res
+                line = '[%d/%d] %s: %.3f s for %d frames' % (i + 1, len(todo), point_name(res[0]), res[1], res[2])
+                if res[3] is not None:
+                    line += ', ' + evaluation.format_summary(res[3])
+                print(line)
+        finally:
+            if workers > 1:
+                pool.terminate()
+                pool.join()
+
+    results = [results[point_name(p)] for p in points]
+    names = sorted(sweep_defaults)
+    with open('%s/sweep_%s.csv' % (out_root, phase), 'w') as f:
+        print(','.join(names + ['time', 'frames'] + sweep_metrics), file=f)
+        for point, total_time, total_frames, metrics in results:
+            values = [str(point[name]) for name in names] + ['%.3f' % total_time, '%d' % total_frames]
+            if metrics is not None:
+                values += ['%g' % metrics[name] for name in sweep_metrics]
+            print(','.join(values), file=f)
+    return results
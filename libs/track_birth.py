@@ -0,0 +1,69 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from . import calculate_cost
+
+
+class BirthChains(object):
+    """
+  This class keeps the candidate tracklets of unmatched detections that are not targets yet. Every chain is a
+  sequence of unmatched detections of consecutive frames, linked by IoU. In every frame, all chains are extended
+  by one frame with a single assignment against the unmatched detections of the frame, detections that do not
+  extend a chain begin new chains and chains that do not get a detection end.
+  A chain is confirmed as a new target when it is at least length frames long and the mean score of its last
+  length detections is larger than min_score. Unconfirmed chains go on, so the score is checked over a sliding
+  window of the last length frames.
+  Chains are kept in the order of their last detection in the unmatched detections of the frame.
+  """
+    def __init__(self, length=3, min_score=2/3., iou_threshold=0.3):
+        if length < 2:
+            raise ValueError('a new target needs detections of at least 2 frames, not %d' % length)
+        self.length = length
+        self.min_score = min_score
+        self.iou_threshold = iou_threshold
+        self.boxes = np.zeros((0, 5))                   # last detection of every chain [x1,y1,x2,y2,score]
+        self.boxes_before = np.zeros((0, 5))            # detection of every chain in the frame before
+        self.scores = np.zeros((0, length))             # scores of the last detections, the newest first
+        self.frames = np.zeros(0, dtype=int)            # number of frames of every chain
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def remove(self, index):
+        """
+    Ends the chains of index, e.g. when their last detection is matched to an occluded target
+    """
+        keep = np.ones(len(self.boxes), dtype=bool)
+        keep[index] = False
+        self.boxes = self.boxes[keep]
+        self.boxes_before = self.boxes_before[keep]
+        self.scores = self.scores[keep]
+        self.frames = self.frames[keep]
+
+    def extend(self, dets):
+        """
+    Extends the chains with the unmatched detections [[x1,y1,x2,y2,score],...] of a new frame
+    Returns (births, births_before), the last two detections of every confirmed chain, in the order of dets
+    """
+        dets = calculate_cost.as_boxes(dets).reshape(-1, 5)
+        # chain extended by every detection, -1 if it begins a new chain
+        link = np.full(len(dets), -1)
+        if len(dets) > 0 and len(self.boxes) > 0:
+            iou_matrix = calculate_cost.cal_iou(dets, self.boxes)
+            rows, cols = linear_sum_assignment(-iou_matrix)
+            linked = iou_matrix[rows, cols] >= self.iou_threshold
+            link[rows[linked]] = cols[linked]
+        linked = link >= 0
+        frames = np.ones(len(dets), dtype=int)
+        frames[linked] = self.frames[link[linked]] + 1
+        scores = np.zeros((len(dets), self.length))
+        scores[:, 0] = dets[:, 4]
+        scores[linked, 1:] = self.scores[link[linked], :-1]
+        boxes_before = np.zeros((len(dets), 5))
+        boxes_before[linked] = self.boxes[link[linked]]
+
+        confirmed = (frames >= self.length) & (scores.sum(axis=1) > self.min_score * self.length)
+        self.boxes = dets[~confirmed]
+        self.boxes_before = boxes_before[~confirmed]
+        self.scores = scores[~confirmed]
+        self.frames = frames[~confirmed]
+        return dets[confirmed], boxes_before[confirmed]
@@ -0,0 +1,112 @@
+import numpy as np
+
+
+# bookkeeping of a target, one row of a track table
+track_dtype = [('id', 'i8'), ('age', 'i8'), ('time_since_update', 'i8'), ('time_since_observed', 'i8'),
+               ('confidence', 'f8')]
+
+
+def record_field(name):
+    """
+  Returns a property that reads and writes a column of the row of a target in its track table
+  """
+    def get(self):
+        return self.table.rec_buf[name][self.row]
+
+    def set(self, value):
+        self.table.rec_buf[name][self.row] = value
+    return property(get, set)
+
+
+class TrackRecord(object):
+    """
+  Base class of targets whose bookkeeping (id, age, time_since_update, time_since_observed and confidence) is
+  a row of the structured array of a TrackTable. The attributes read and write that row, so a target can be
+  used as before, while the tracker reads and updates the columns of all targets at once.
+  A new target is the only row of its own table until it is appended to the table of a tracker.
+  """
+    id = record_field('id')
+    age = record_field('age')
+    time_since_update = record_field('time_since_update')
+    time_since_observed = record_field('time_since_observed')
+    confidence = record_field('confidence')
+
+    def init_record(self):
+        self.table = TrackTable(capacity=1)
+        self.row = 0
+        self.table.trackers.append(self)
+
+    def detach(self):
+        """
+    Moves the row of the target to its own table, when it is removed from the table of a tracker
+    """
+        rec = self.table.rec_buf[self.row].copy()
+        self.init_record()
+        self.table.rec_buf[0] = rec
+
+
+class TrackTable(object):
+    """
+  This class keeps the targets of a tracker and their bookkeeping in one NumPy structured array (track_dtype),
+  where row i belongs to target i. It behaves like the list of targets used by Sort_OH: it can be indexed,
+  iterated, appended to and popped from. The columns of all targets are read as arrays (rec['age']) and
+  targets are removed with a mask in one step at the end of a stage (compact()), instead of one pop per target.
+  """
+    def __init__(self, capacity=64):
+        self.trackers = []
+        self.rec_buf = np.zeros(capacity, dtype=track_dtype)
+
+    @property
+    def rec(self):
+        return self.rec_buf[:len(self.trackers)]
+
+    def __len__(self):
+        return len(self.trackers)
+
+    def __getitem__(self, i):
+        return self.trackers[i]
+
+    def __iter__(self):
+        return iter(self.trackers)
+
+    def __reversed__(self):
+        return reversed(self.trackers)
+
+    def append(self, trk):
+        """
+    Appends a target and moves its row to the next free row of the table
+    """
+        n = len(self.trackers)
+        if n == len(self.rec_buf):
+            # double the number of rows
+            self.rec_buf = np.concatenate((self.rec_buf, np.zeros(max(n, 1), dtype=track_dtype)))
+        self.rec_buf[n] = trk.table.rec_buf[trk.row]
+        trk.table = self
+        trk.row = n
+        self.trackers.append(trk)
+
+    def compact(self, keep):
+        """
+    Removes the targets where the boolean mask keep is False in one step, the others keep their order
+    """
+        keep = np.asarray(keep, dtype=bool)
+        n = len(self.trackers)
+        if keep.all():
+            return
+        removed = [trk for trk, k in zip(self.trackers, keep) if not k]
+        for trk in removed:
+            trk.detach()
+        self.rec_buf[:n - len(removed)] = self.rec_buf[:n][keep]
+        self.trackers = [trk for trk, k in zip(self.trackers, keep) if k]
+        for row, trk in enumerate(self.trackers):
+            trk.row = row
+
+    def pop(self, i):
+        """
+    Removes target i and returns it
+    """
+        trk = self.trackers[i]
+        keep = np.ones(len(self.trackers), dtype=bool)
+        keep[i] = False
+        self.compact(keep)
+        return trk
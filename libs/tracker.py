@@ -1,136 +1,217 @@
 import numpy as np
 from . import association
 from . import kalman_tracker
+from . import kalman_bank
+from . import track_table
+from . import track_birth
 from . import calculate_cost
 
 
 class Sort_OH(object):
 
-    def __init__(self, max_age=3, min_hits=3):
+    def __init__(self, max_age=3, min_hits=3, batched=False, gated=False, birth_frames=3):
         """
     Sets key parameters for SORT
+    A new target is created from unmatched detections of birth_frames consecutive frames (see track_birth.py).
+    If batched is True, the Kalman filters of all targets are kept in one array-backed bank and
+    are predicted and corrected together, instead of one filterpy KalmanFilter per target.
+    If gated is True, detections are associated to targets with a sparse assignment of overlapping pairs,
+    which is faster for thousands of boxes per frame.
     """
         self.max_age = max_age
         self.min_hits = min_hits
-        self.trackers = []
+        self.batched = batched
+        self.gated = gated
+        if batched:
+            self.trackers = kalman_bank.KalmanBoxTrackerBank()
+        else:
+            self.trackers = track_table.TrackTable()
         self.area_avg_array = []
         self.frame_count = 0
-        self.unmatched_before_before = []
-        self.unmatched_before = []
-        self.unmatched = []
+        self.birth = track_birth.BirthChains(birth_frames)  # chains of unmatched detections of the last frames
         self.seq = []
         self.conf_trgt = 0
         self.conf_objt = 0
+        self.iou_threshold = 0.3    # minimum IoU of a detection and a target to be associated
+        self.ios_threshold = 0.3    # minimum IoS of a target by other targets to be occluded by them
+        self.evaluator = None   # optional evaluation.MOTEvaluator, updated with gts of every frame
+        self.profiler = None    # optional profiling.StageProfiler, records time of every stage of update
+        self.next_id = None     # if set, IDs of new targets are counted by this tracker, not KalmanBoxTracker.count
+        self.scene = None       # optional [width, height] of the image, otherwise it is chosen by self.seq
+        self.assignment = association.Assignment()  # result of the association, reused in every frame
+        self.gt_diff = False    # if True, ground truths not covered by a found target are returned (for display)
 
-    def update(self, dets, gts):
+    def add_tracker(self, bbox, init_mode, bbox_before):
+        """
+    Creates a new target, either in the filter bank or as a separate KalmanBoxTracker
+    """
+        trk_id = None
+        if self.next_id is not None:
+            trk_id = self.next_id
+            self.next_id += 1
+        if self.batched:
+            return self.trackers.add(bbox, init_mode, bbox_before, trk_id)
+        trk = kalman_tracker.KalmanBoxTracker(bbox, init_mode, bbox_before, trk_id)
+        self.trackers.append(trk)
+        return trk
+
+    def update(self, dets, gts, gt_ids=None):
         """
     Params:
       dets - a numpy array of detections in the format [[x1,y1,x2,y2,score],[x1,y1,x2,y2,score],...]
+      gts - a numpy array of ground truths in the same format (used for display and evaluation)
+      gt_ids - IDs of gts, if they are given and self.evaluator is set, the output of the frame is evaluated
     Requires: this method must be called once for each frame even with empty detections.
     Returns the a similar array, where the last column is the object ID.
 
     NOTE: The number of objects returned may differ from the number of detections provided.
     """
+        trks, area_avg = self.predict_targets(len(dets))
+        return self.update_targets(dets, gts, gt_ids, trks, area_avg)
+
+    def predict_targets(self, num_dets=0, predicted=None, area_sum=None, outside=None):
+        """
+    First stage of update(): predicts the locations of the targets in the new frame and removes targets with
+    invalid locations or mostly outside the image.
+    In batched mode, the predicted bounding boxes (N,4), the sum of areas and the outside ratio of the
+    predicted boxes can be given when they are computed for several trackers at once (see multi_tracker.py),
+    then the filter bank is not predicted again.
+    Returns (trks, area_avg), the predicted bounding boxes of the remaining targets and their average area
+    """
+        prof = self.profiler
+        if prof is not None:
+            t_prof = prof.start()
+            prof.count('tracks', len(self.trackers))
+            prof.count('detections', num_dets)
         self.frame_count += 1
         # get predicted locations from existing trackers.
         trks = np.zeros((len(self.trackers), 5))
-        to_del = []
-        ret = []
-        area_sum = 0
-        for t, trk in enumerate(trks):
-            pos = self.trackers[t].predict()[0]
-            trk[:] = [pos[0], pos[1], pos[2], pos[3], 0]
-            area_sum = area_sum + self.trackers[t].kf.x[2]
-            if np.any(np.isnan(pos)):
-                to_del.append(t)
+        area_sum = 0 if area_sum is None else area_sum
+        if self.batched:
+            if len(self.trackers) > 0:
+                if predicted is None:
+                    trks[:, 0:4] = self.trackers.predict()
+                    # cumulative sum adds areas one by one in the same order as the per-target loop
+                    area_sum = np.cumsum(self.trackers.x[:, 2])[-1:]
+                else:
+                    trks[:, 0:4] = predicted
+        else:
+            for t, trk in enumerate(trks):
+                pos = self.trackers[t].predict()[0]
+                trk[:] = [pos[0], pos[1], pos[2], pos[3], 0]
+                area_sum = area_sum + self.trackers[t].kf.x[2]
         area_avg = 0
         if len(self.trackers) > 0:
             area_avg = area_sum/len(self.trackers)
         self.area_avg_array.append(area_avg)
-        trks = np.ma.compress_rows(np.ma.masked_invalid(trks))
-        for t in reversed(to_del):
-            self.trackers.pop(t)
-        # remove outside image trackers
-        to_del = []
-        if self.seq == 'MOT17-05-DPM' or self.seq == 'MOT17-05-FRCNN' or self.seq == 'MOT17-05-SDP' \
+        # targets with invalid locations
+        keep = np.all(np.isfinite(trks), axis=1)
+        if outside is not None:
+            outside = outside[keep]
+        trks = trks[keep]
+        if prof is not None:
+            t_prof = prof.lap('predict', t_prof)
+        # remove outside image trackers, together with the invalid ones in one step
+        if outside is None:
+            outside = calculate_cost.cal_outside(trks, self.scene_size())
+        inside = outside <= 0.5
+        keep[keep] = inside
+        trks = trks[inside]
+        self.trackers.compact(keep)
+        if prof is not None:
+            t_prof = prof.lap('outside', t_prof)
+        return trks, area_avg
+
+    def scene_size(self):
+        """
+    Returns [width, height] of the image of the sequence
+    """
+        if self.scene is not None:
+            return np.asarray(self.scene)
+        elif self.seq == 'MOT17-05-DPM' or self.seq == 'MOT17-05-FRCNN' or self.seq == 'MOT17-05-SDP' \
            or self.seq == 'MOT17-05-POI' or self.seq == 'MOT17-06-DPM' or self.seq == 'MOT17-06-FRCNN' \
            or self.seq == 'MOT17-06-SDP' or self.seq == 'MOT17-06-POI':
-            scene = np.array([640, 480])
+            return np.array([640, 480])
         else:
-            scene = np.array([1920, 1080])
-        outside = calculate_cost.cal_outside(trks, scene)
-        for t in range(len(outside)):
-            if outside[t] > 0.5:
-                to_del.append(t)
-        for t in reversed(to_del):
-            self.trackers.pop(t)
-            trks = np.delete(trks, t, 0)
+            return np.array([1920, 1080])
 
-        matched, unmatched_dets, unmatched_trks, occluded_trks, unmatched_gts = association.associate_detections_to_trackers(self, dets, trks, gts, area_avg)
+    def update_targets(self, dets, gts, gt_ids, trks, area_avg, iou_matrix=None):
+        """
+    Second stage of update(): associates detections to the predicted targets trks of predict_targets(), corrects
+    the matched targets, creates new targets and removes dead ones.
+    iou_matrix is the optional IoU of dets and trks, when it is computed for several trackers at once.
+    Returns the same as update()
+    """
+        prof = self.profiler
+        ret = []
+        assignment = association.associate_detections_to_trackers(
+            self, dets, trks, gts, area_avg, self.iou_threshold, self.ios_threshold, iou_matrix, self.gt_diff)
+        unmatched_dets = assignment.unmatched_dets
+        if prof is not None:
+            prof.count('occluded', int(assignment.occluded.sum()))
+            t_prof = prof.tic()
 
         # update matched trackers with assigned detections
         unmatched_trks_pos = []
-        if len(dets) > 0:
-            for t, trk in enumerate(self.trackers):
-                if t not in unmatched_trks:
-                    if t not in occluded_trks:
+        if len(dets) > 0 and len(self.trackers) > 0:
+            trk_det = assignment.trk_det
+            observed = trk_det >= 0
+            # targets that are neither matched nor occluded
+            unmatched_trks = np.flatnonzero(~observed & ~assignment.occluded)
+            rows = np.flatnonzero(observed | assignment.occluded)
+            if self.batched:
+                # Update according to associated detection or to estimated bounding box of occluded targets
+                bboxes = np.where(observed[rows, None], dets[trk_det[rows], 0:4], trks[rows, 0:4])
+                if len(rows) > 0:
+                    self.trackers.update(rows, bboxes, observed[rows])
+                states = self.trackers.get_state()[unmatched_trks]
+            else:
+                for t in rows:
+                    if observed[t]:
                         # Update according to associated detection
-                        d = matched[np.where(matched[:, 1] == t)[0], 0]
-                        trk.update(dets[d, :][0], 1)
+                        self.trackers[t].update(dets[trk_det[t], :], 1)
                     else:
                         # Update according to estimated bounding box
-                        trk.update(trks[t, :], 0)
-                else:
-                    unmatched_trks_pos.append(np.concatenate((trk.get_state()[0], [trk.id + 1])).reshape(1, -1))
+                        self.trackers[t].update(trks[t, :], 0)
+                states = np.concatenate([self.trackers[t].get_state() for t in unmatched_trks]) \
+                    if len(unmatched_trks) > 0 else np.empty((0, 4))
+            unmatched_trks_pos.append(np.concatenate(
+                (states, self.trackers.rec['id'][unmatched_trks, None] + 1), axis=1))
+        if prof is not None:
+            t_prof = prof.lap('kalman_update', t_prof)
 
         # create and initialise new trackers for unmatched detections
         if self.frame_count <= self.min_hits:
             for i in unmatched_dets:
                 # Put condition on uncertainty
                 if dets[i, 4] > 0.6:
-                    trk = kalman_tracker.KalmanBoxTracker(dets[i, :], 0, dets[i, :]) # put dets[i, :] as dummy data for last argument
-                    self.trackers.append(trk)
+                    self.add_tracker(dets[i, :], 0, dets[i, :])  # put dets[i, :] as dummy data for last argument
         else:
-            self.unmatched = []
-            for i in unmatched_dets:
-                self.unmatched.append(dets[i, :])
-
-            # Build new targets
-            if (len(self.unmatched_before_before) != 0) and (len(self.unmatched_before) != 0) and (len(self.unmatched) != 0):
-                new_trackers, del_ind = association.find_new_trackers_2(self.unmatched, self.unmatched_before, self.unmatched_before_before, area_avg)
-                if len(new_trackers) > 0:
-                    unm = np.asarray(self.unmatched)
-                    unmb = np.asarray(self.unmatched_before)
-                    unmbb = np.asarray(self.unmatched_before_before)
-                    # sort del_ind in descending order so removing step by step do not make error
-                    del_ind = np.sort(del_ind, axis=0)
-                    del_ind = np.flip(del_ind, axis=0)
-                    for i, new_tracker in enumerate(new_trackers):
-                        new_trk_certainty = unm[new_tracker[0], 4] + unmb[new_tracker[1], 4] + unmbb[new_tracker[2], 4]
-                        if new_trk_certainty > 2:
-                            trk = kalman_tracker.KalmanBoxTracker(unm[new_tracker[0], :], 1, unmb[new_tracker[1], :])
-                            self.trackers.append(trk)
-                            # remove matched detection from unmatched arrays
-                            self.unmatched.pop(del_ind[i, 0])
-                            self.unmatched_before.pop(del_ind[i, 1])
-                            self.unmatched_before_before.pop(del_ind[i, 2])
-            self.unmatched_before_before = self.unmatched_before
-            self.unmatched_before = self.unmatched
+            # Build new targets: the chains of unmatched detections are extended with the unmatched detections of
+            # this frame and confirmed chains become targets, initialized with their last two detections
+            births, births_before = self.birth.extend(dets[unmatched_dets])
+            for bbox, bbox_before in zip(births, births_before):
+                self.add_tracker(bbox, 1, bbox_before)
+        if prof is not None:
+            t_prof = prof.lap('new_trackers', t_prof)
 
         # get position of unmatched ground truths
         unmatched_gts_pos = []
-        for g in unmatched_gts:
-            unmatched_gts_pos.append(gts[g, :].reshape(1, 5))
+        if len(assignment.unmatched_gts) > 0:
+            unmatched_gts_pos.append(gts[assignment.unmatched_gts, :].reshape(-1, 5))
 
-        i = len(self.trackers)
-        for trk in reversed(self.trackers):
-            d = trk.get_state()[0]
-            if trk.time_since_update < 1:
-                ret.append(np.concatenate((d, [trk.id + 1])).reshape(1, -1))  # +1 as MOT benchmark requires positive
-            i -= 1
-            # remove dead tracklet
-            if trk.time_since_update > (np.minimum(7, self.max_age + self.trackers[i].age/10)):
-                self.trackers.pop(i)
+        if len(self.trackers) > 0:
+            # in batched mode the states of all targets are converted to bounding boxes at once
+            if self.batched:
+                states = self.trackers.get_state()
+            else:
+                states = np.concatenate([trk.get_state() for trk in self.trackers])
+            rec = self.trackers.rec
+            # targets are reported in reversed order, +1 as MOT benchmark requires positive
+            updated = np.where(rec['time_since_update'] < 1)[0][::-1]
+            ret.append(np.concatenate((states[updated], rec['id'][updated, None] + 1), axis=1))
+            # remove dead tracklets
+            self.trackers.compact(rec['time_since_update'] <= np.minimum(7, self.max_age + rec['age']/10))
         out1 = np.empty((0, 5))
         out2 = np.empty((0, 5))
         out3 = np.empty((0, 5))
@@ -141,4 +222,9 @@ class Sort_OH(object):
             out2 = np.concatenate(unmatched_trks_pos)
         if len(unmatched_gts_pos) > 0:
             out3 = np.concatenate(unmatched_gts_pos)
+        if prof is not None:
+            prof.lap('deletion', t_prof)
+            prof.stop()
+        if self.evaluator is not None and gt_ids is not None:
+            self.evaluator.update(gts, gt_ids, out1)
         return out1, out2, out3
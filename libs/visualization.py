@@ -1,10 +1,16 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+import matplotlib.colors as mcolors
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import os.path
+import collections
+import multiprocessing
+import concurrent.futures
 import cv2
-from PIL import Image
 from . import convert
+from . import calculate_cost
+from . import frame_source
 
 
 colours_rand = np.random.rand(32, 3)  # used only for display
@@ -33,6 +39,7 @@ colours = [
     'tomato', 'turquoise', 'violet', 'wheat', 'white', 'whitesmoke', 'yellowgreen'
 ]
 clrs = ['r', 'b', 'g', 'm', 'c', 'y', 'w', 'k']  # used for displaying center of bounding boxes
+colours_bgr = {}    # colours converted for OpenCV by colour_bgr()
 
 
 class DisplayState:
@@ -45,6 +52,32 @@ class DisplayState:
     display_gt_diff = False
     display_trgt_id = False
     display_det_uncer = False
+    backend = 'matplotlib'  # 'matplotlib' or 'opencv' (faster, draws on the image in its own resolution)
+
+
+def display_state():
+    """
+  Returns the current DisplayState toggles as a dict, to render a frame with them in another thread or process
+  """
+    return dict((name, value) for name, value in vars(DisplayState).items()
+                if name.startswith('display') or name == 'backend')
+
+
+def extended_boxes(mot_trackers):
+    """
+  Returns the extended bounding boxes of occluded targets in the format [[x1,y1,x2,y2,id],...]
+  """
+    boxes = []
+    for t in mot_trackers:
+        if t.time_since_observed > 0:
+            bbx = convert.x_to_bbox(t.kf.x[0:4], None)
+            ex_w, ex_h = calculate_cost.ext_factors(t.time_since_observed)
+            w = (bbx[0, 2] - bbx[0, 0])*(1 + ex_w)
+            h = (bbx[0, 3] - bbx[0, 1])*(1 + ex_h)
+            left_p = bbx[0, 0] - (bbx[0, 2] - bbx[0, 0]) * ex_w / 2
+            top_p = bbx[0, 1] - (bbx[0, 3] - bbx[0, 1]) * ex_h / 2
+            boxes.append([left_p, top_p, left_p + w, top_p + h, t.id + 1])
+    return np.array(boxes).reshape(-1, 5)
 
 
 # display details such as bounding boxes in the image
@@ -52,82 +85,275 @@ def dispaly_details(common_path, imgFolder, frame, dets, gts, trackers,
                     unmatched_trckr, unmatched_gts, mot_trackers):
     # display image
     if DisplayState.display:
-        img = Image.open('%s/img1/%06d.jpg' % (common_path, frame))
-        im = np.array(img, dtype=np.uint8)
-        fig, ax = plt.subplots(1, figsize=(19.5, 11))
+        render_frame(common_path, imgFolder, frame, dets, gts, trackers, unmatched_trckr, unmatched_gts,
+                     extended_boxes(mot_trackers))
+
+
+def overlay_items(dets, gts, trackers, unmatched_trckr, unmatched_gts, extended, state):
+    """
+  Lists what is drawn on a frame with the toggles of state, the same for every rendering backend
+  Returns (rects, texts):
+    rects - list of (box [x1,y1,x2,y2], colour, linewidth, dashed) in drawing order
+    texts - list of (x, y, text, fontsize, background colour)
+  """
+    rects = []
+    texts = []
+    # display trackers
+    if state['display_trgts']:
+        for t in trackers:
+            rects.append((t[0:4], colours[int(t[4]) % 50], 5, False))
+            # display target id
+            if state['display_trgt_id']:
+                texts.append((t[0], t[1] - 5, int(t[4]), 14, colours[int(t[4]) % 50]))
+
+    # display unmatched trackers
+    if state['display_unmatched_trks']:
+        for ut in unmatched_trckr:
+            rects.append((ut[0:4], colours[int(ut[4]) % 50], 2, True))
+
+    # display extended bounding boxes of occluded targets
+    if state['display_extended']:
+        for e in extended:
+            rects.append((e[0:4], colours[int(e[4]) % 50], 2, True))
+
+    # display detections
+    if state['display_dets']:
+        for d in dets:
+            rects.append((d[0:4], 'k', 2, False))
+            # display detection uncertainty
+            if state['display_det_uncer']:
+                texts.append((d[0], d[1] + 8, d[4], 10, 'k'))
+
+    # display ground truths
+    if state['display_gt']:
+        for g in gts:
+            rects.append((g[0:4], 'r', 2, True))
+
+    # display unmatched ground truths
+    if state['display_gt_diff']:
+        for ugt in unmatched_gts:
+            rects.append((ugt[0:4], 'r', 2, True))
+    return rects, texts
+
+
+def render_frame(common_path, imgFolder, frame, dets, gts, trackers, unmatched_trckr, unmatched_gts, extended,
+                 state=None, save_image=True, return_image=False, image=None, scale=1.):
+    """
+  Draws the enabled bounding boxes on the image of frame and saves it in imgFolder if save_image is True
+  extended are the boxes of extended_boxes(), state the toggles of display_state(), by default the current ones
+  The backend of state draws with matplotlib (a figure without pyplot, so frames can be rendered in several
+  threads) or straight on the image with OpenCV
+  image is the already decoded image of the frame (RGB for matplotlib, BGR for OpenCV), e.g. by a
+  frame_source.FrameReader, scale its size relative to the original image
+  Returns the rendered BGR image if return_image is True, otherwise None
+  """
+    state = state or display_state()
+    rects, texts = overlay_items(dets, gts, trackers, unmatched_trckr, unmatched_gts, extended, state)
+    path = '%s/%s/%06d.jpg' % (common_path, imgFolder, frame)
+    if state['backend'] == 'opencv':
+        if image is None:
+            im = frame_source.read_image('%s/img1/%06d.jpg' % (common_path, frame), 'bgr', scale)
+        else:
+            # the image may be shared with other users of a frame cache
+            im = image.copy()
+        draw_cv(im, rects, texts, scale)
+        if save_image:
+            cv2.imwrite(path, im)
+        return im if return_image else None
+    im = image
+    if im is None:
+        im = frame_source.read_image('%s/img1/%06d.jpg' % (common_path, frame), 'rgb', scale)
+    fig = draw_figure(im, rects, texts, scale)
+    if save_image:
+        fig.savefig(path)
+    if not return_image:
+        return None
+    canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+    # RGBA to BGR
+    return np.asarray(canvas.buffer_rgba())[:, :, 2::-1].copy()
+
+
+def draw_figure(im, rects, texts, scale=1.):
+    """
+  Draws rects and texts of overlay_items() on the RGB image im with matplotlib and returns the figure
+  If im is scaled down by scale, it is stretched to the coordinates of the original image
+  """
+    fig = Figure(figsize=(19.5, 11))
+    ax = fig.subplots(1)
+    if scale == 1.:
         ax.imshow(im)
+    else:
+        ax.imshow(im, extent=(-0.5, im.shape[1] / scale - 0.5, im.shape[0] / scale - 0.5, -0.5))
+    for box, colour, linewidth, dashed in rects:
+        rect = patches.Rectangle((box[0], box[1]), box[2] - box[0], box[3] - box[1], linewidth=linewidth,
+                                 edgecolor=colour, linestyle='dashed' if dashed else 'solid', facecolor='none')
+        ax.add_patch(rect)
+    for x, y, text, fontsize, colour in texts:
+        ax.text(x, y, text, fontsize=fontsize, bbox={'facecolor': colour, 'alpha': 0.5, 'pad': 2})
+    # save image & enabled bounding boxes
+    # to reduce the margins of the image
+    fig.tight_layout()
+    return fig
+
+
+def colour_bgr(colour):
+    """
+  Returns the OpenCV BGR tuple of a matplotlib colour name
+  """
+    if colour not in colours_bgr:
+        r, g, b = mcolors.to_rgb(colour)
+        colours_bgr[colour] = (int(round(b * 255)), int(round(g * 255)), int(round(r * 255)))
+    return colours_bgr[colour]
+
+
+def draw_dashed_line(im, p1, p2, colour, thickness, dash=10, gap=6):
+    length = np.hypot(p2[0] - p1[0], p2[1] - p1[1])
+    for s in np.arange(0, length, dash + gap):
+        e = min(s + dash, length)
+        a = (int(round(p1[0] + (p2[0] - p1[0]) * s / length)), int(round(p1[1] + (p2[1] - p1[1]) * s / length)))
+        b = (int(round(p1[0] + (p2[0] - p1[0]) * e / length)), int(round(p1[1] + (p2[1] - p1[1]) * e / length)))
+        cv2.line(im, a, b, colour, thickness)
+
+
+def draw_cv(im, rects, texts, scale=1.):
+    """
+  Draws rects and texts of overlay_items() on the BGR image im in place with OpenCV and returns it
+  If im is scaled down by scale, coordinates are scaled with it
+  Line widths in points of matplotlib are used as pixels
+  """
+    for box, colour, linewidth, dashed in rects:
+        if not np.all(np.isfinite(box[0:4])):
+            continue
+        x1, y1, x2, y2 = [int(round(v * scale)) for v in box[0:4]]
+        colour = colour_bgr(colour)
+        if dashed:
+            corners = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+            for c in range(4):
+                draw_dashed_line(im, corners[c], corners[(c + 1) % 4], colour, linewidth)
+        else:
+            cv2.rectangle(im, (x1, y1), (x2, y2), colour, linewidth)
+    for x, y, text, fontsize, colour in texts:
+        text = str(text)
+        font_scale = fontsize / 30.
+        (w, h), base = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)
+        x, y = int(round(x * scale)), int(round(y * scale))
+        # half transparent background of the text
+        x1, y1 = max(x - 2, 0), max(y - h - 2, 0)
+        x2, y2 = min(x + w + 2, im.shape[1]), min(y + base + 2, im.shape[0])
+        if x2 > x1 and y2 > y1:
+            roi = im[y1:y2, x1:x2]
+            roi[:] = roi // 2 + np.array(colour_bgr(colour), dtype=np.uint8) // 2
+        cv2.putText(im, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), 1, cv2.LINE_AA)
+    return im
+
+
+class RenderPipeline(object):
+    """
+  This class renders frames in a pool of worker processes (or threads) while tracking goes on.
+  The outputs of the tracker in a frame are copied when the frame is submitted, so the tracker can change its
+  state while the frame is waiting. At most max_pending frames wait to be rendered; when there are more,
+  submit() waits for the oldest one, so a slow renderer slows down tracking instead of filling the memory.
+  With workers=0 frames are rendered synchronously in submit(), like dispaly_details().
+  Processes can not be started in daemonic processes (workers of runner.run_sequences), threads are used there.
+  If video is a path, rendered frames are also written to that video file. Frames are collected in the order
+  they are submitted, so they are written in order even when they are rendered in parallel. With
+  save_images=False no image of a frame is saved and only the video is written.
+  reader is an optional frame_source.FrameReader, then images are decoded ahead on its threads and given to the
+  renderer (its mode must match the backend).
+  state is the dict of display toggles and backend of display_state(), by default the current DisplayState.
+  """
+    def __init__(self, workers=2, max_pending=8, processes=True, video=None, save_images=True, fps=10,
+                 reader=None, state=None):
+        self.workers = workers
+        self.state = state or display_state()
+        self.reader = reader
+        self.max_pending = max(max_pending, 1)
+        self.pending = collections.deque()
+        self.video = VideoSink(video, fps) if video is not None and self.state['display'] else None
+        self.save_images = save_images
+        self.executor = None
+        if workers > 0 and self.state['display']:
+            if processes and not multiprocessing.current_process().daemon:
+                self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+            else:
+                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+    def submit(self, common_path, imgFolder, frame, dets, gts, trackers, unmatched_trckr, unmatched_gts,
+               mot_trackers):
+        """
+    Takes the same arguments as dispaly_details() and renders the frame in the background
+    """
+        if not self.state['display']:
+            return
+        args = (common_path, imgFolder, frame, np.array(dets, copy=True), np.array(gts, copy=True),
+                np.array(trackers, copy=True), np.array(unmatched_trckr, copy=True),
+                np.array(unmatched_gts, copy=True), extended_boxes(mot_trackers), self.state,
+                self.save_images, self.video is not None)
+        if self.reader is not None:
+            args += (self.reader.get(frame), self.reader.scale)
+        if self.executor is None:
+            self.collect(render_frame(*args))
+            return
+        while len(self.pending) >= self.max_pending:
+            self.collect(self.pending.popleft().result())
+        self.pending.append(self.executor.submit(render_frame, *args))
+
+    def collect(self, im):
+        if self.video is not None:
+            self.video.write(im)
+
+    def close(self):
+        """
+    Waits until all submitted frames are rendered, errors of rendering are raised here
+    """
+        try:
+            while len(self.pending) > 0:
+                self.collect(self.pending.popleft().result())
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+            if self.video is not None:
+                self.video.close()
+
+
+class VideoSink(object):
+    """
+  This class writes rendered BGR frames to a video file one by one, without saving them as images first.
+  The video is opened with the size of the first frame, later frames of another size are resized to it.
+  """
+    def __init__(self, path, fps=10, fourcc='DIVX'):
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.video = None
+        self.size = None
+        self.frames = 0
+
+    def write(self, im):
+        if self.video is None:
+            self.size = (im.shape[1], im.shape[0])
+            self.video = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, self.size)
+        if (im.shape[1], im.shape[0]) != self.size:
+            im = cv2.resize(im, self.size)
+        self.video.write(im)
+        self.frames += 1
 
-        # display trackers
-        if DisplayState.display_trgts:
-            for t in trackers:
-                rect = patches.Rectangle((t[0], t[1]), t[2] - t[0], t[3] - t[1], linewidth=5,
-                                         edgecolor=colours[int(t[4]) % 50], facecolor='none')
-                ax.add_patch(rect)
-                # display target id
-                if DisplayState.display_trgt_id:
-                    plt.text(t[0], t[1] - 5, int(t[4]), fontsize=14, bbox={'facecolor': colours[int(t[4]) % 50], 'alpha': 0.5, 'pad': 2})
-
-        # display unmatched trackers
-        if DisplayState.display_unmatched_trks:
-            for ut in unmatched_trckr:
-                rect = patches.Rectangle((ut[0], ut[1]), ut[2] - ut[0], ut[3] - ut[1], linewidth=2,
-                                         edgecolor=colours[int(ut[4]) % 50], linestyle='dashed', facecolor='none')
-                ax.add_patch(rect)
-
-        # display extended bounding boxes of occluded targets
-        if DisplayState.display_extended:
-            for t in mot_trackers:
-                if t.time_since_observed > 0:
-                    bbx = convert.x_to_bbox(t.kf.x[0:4], None)
-                    ex_w = np.minimum(1.2, (t.time_since_observed + 1) * 0.3)
-                    ex_h = np.minimum(0.5, (t.time_since_observed + 1) * 0.1)
-                    w = (bbx[0, 2] - bbx[0, 0])*(1 + ex_w)
-                    h = (bbx[0, 3] - bbx[0, 1])*(1 + ex_h)
-                    left_p = bbx[0, 0] - (bbx[0, 2] - bbx[0, 0]) * ex_w / 2
-                    top_p = bbx[0, 1] - (bbx[0, 3] - bbx[0, 1]) * ex_h / 2
-                    rect = patches.Rectangle((left_p, top_p), w, h, linewidth=2,
-                                             edgecolor=colours[int(t.id + 1) % 50], linestyle='dashed', facecolor='none')
-                    ax.add_patch(rect)
-
-        # display detections
-        if DisplayState.display_dets:
-            for d in dets:
-                rect = patches.Rectangle((d[0], d[1]), d[2] - d[0], d[3] - d[1], linewidth=2, edgecolor='k',
-                                         facecolor='none')
-                ax.add_patch(rect)
-                # display detection uncertainty
-                if DisplayState.display_det_uncer:
-                    plt.text(d[0], d[1] + 8, d[4], fontsize=10, bbox={'facecolor': 'k', 'alpha': 0.5, 'pad': 2})
-
-        # display ground truths
-        if DisplayState.display_gt:
-            for g in gts:
-                rect = patches.Rectangle((g[0], g[1]), g[2] - g[0], g[3] - g[1], linewidth=2,
-                                         edgecolor='r', linestyle='dashed', facecolor='none')
-                ax.add_patch(rect)
-
-        # display unmatched ground truths
-        if DisplayState.display_gt_diff:
-            for ugt in unmatched_gts:
-                rect = patches.Rectangle((ugt[0], ugt[1]), ugt[2] - ugt[0], ugt[3] - ugt[1], linewidth=2,
-                                         edgecolor='r', linestyle='dashed', facecolor='none')
-                ax.add_patch(rect)
-
-        # save image & enabled bounding boxes
-        # to reduce the margins of the image
-        fig.tight_layout()
-        fig.savefig('%s/%s/%06d.jpg' % (common_path, imgFolder, frame))
-        plt.close(fig)
+    def close(self):
+        if self.video is not None:
+            self.video.release()
+            self.video = None
 
 
 # Video Generating function
 def generate_video(image_folder, video_name, fps):
     if DisplayState.display:
         # Array images should only consider the image files ignoring others if any
-        images = [img for img in os.listdir(image_folder)
-                  if img.endswith(".jpg") or
-                  img.endswith(".jpeg") or
-                  img.endswith(".png")]
+        # images are named by frame number, os.listdir does not list them in order
+        images = sorted(img for img in os.listdir(image_folder)
+                        if img.endswith(".jpg") or
+                        img.endswith(".jpeg") or
+                        img.endswith(".png"))
         frame = cv2.imread(os.path.join(image_folder, images[0]))
 
         # setting the frame width, height width according to the width & height of first image
@@ -0,0 +1,46 @@
+from __future__ import print_function
+import argparse
+import asyncio
+
+# new imports
+from libs import service
+
+
+def parse_args():
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description='SORT with occlusion handling streaming service')
+    parser.add_argument('--port', dest='port', help='Serve a TCP socket on this port instead of stdin/stdout [None]',
+                        type=int, default=None)
+    parser.add_argument('--host', dest='host', help='Host of the TCP socket [127.0.0.1]', default='127.0.0.1')
+    parser.add_argument('--unix', dest='unix', help='Serve a unix socket at this path instead of stdin/stdout [None]',
+                        default=None)
+    parser.add_argument('--binary', dest='binary', help='Use the binary framing instead of JSON lines [False]',
+                        action='store_true')
+    parser.add_argument('--queue_size', dest='queue_size',
+                        help='Frames of a camera waiting to be tracked before reading is paused [8]',
+                        type=int, default=8)
+    parser.add_argument('--workers', dest='workers', help='Threads that track the frames of cameras [min(32, CPUs + 4)]',
+                        type=int, default=None)
+    parser.add_argument('--batched', dest='batched', help='Use the batched Kalman filter bank [False]',
+                        action='store_true')
+    parser.add_argument('--gated', dest='gated', help='Use the sparse gated association [False]',
+                        action='store_true')
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+    conf_trgt = 0.35
+    conf_objt = 0.75
+    args = parse_args()
+
+    codec = service.BinaryCodec() if args.binary else service.JsonLineCodec()
+    tracker_service = service.TrackerService(codec, conf_trgt, conf_objt, queue_size=args.queue_size,
+                                             params={'batched': args.batched, 'gated': args.gated},
+                                             workers=args.workers)
+    if args.port is not None:
+        asyncio.run(tracker_service.serve_tcp(args.host, args.port))
+    elif args.unix is not None:
+        asyncio.run(tracker_service.serve_unix(args.unix))
+    else:
+        asyncio.run(tracker_service.serve_stdio())
@@ -1,10 +1,29 @@
+from __future__ import print_function
 import os.path
+import argparse
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from tqdm import tqdm
-from libs import association
-from PIL import Image
+from libs import frame_source
+from libs import mot_source
+from libs import output_diff
+from libs import results_sink
+
+
+def parse_args():
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description='Difference of two outputs of SORT with occlusion handling')
+    parser.add_argument('--no_images', dest='no_images',
+                        help='Only write the difference reports, do not draw the difference of every frame [False]',
+                        action='store_true')
+    parser.add_argument('--iou_threshold', dest='iou_threshold',
+                        help='Minimum IoU of boxes of the two outputs that are the same target [0.3]',
+                        type=float, default=0.3)
+    parser.add_argument('--shift_iou', dest='shift_iou',
+                        help='Matched boxes with lower IoU are reported as shifted [0.9]', type=float, default=0.9)
+    args = parser.parse_args()
+    return args
 
 
 if __name__ == '__main__':
@@ -26,37 +45,43 @@ if __name__ == '__main__':
     imgFolder = 'images/img_conf_vs_before'
     outFolder1 = 'outputs/output_OH_EX_0.2_N_SEP_ShowEx_1'
     outFolder2 = 'outputs/output_OH_EX_0.2_N_SEP_CONF_0.15_0.5'
+    diffFolder = 'outputs/diff_conf_vs_before'
     mot_path = 'C:/Users/mhnas/Courses/Thesis/MOT/MOT17'
+    args = parse_args()
 
     if not os.path.exists(outFolder1) or not os.path.exists(outFolder2):
         print('check the paths for output files')
     else:
+        if not os.path.exists(diffFolder):
+            os.makedirs(diffFolder)
+        sum_file = open('%s/summary_%s.txt' % (diffFolder, phase), 'w')
         for seq in sequences:
             common_path = ('%s/%s/%s' % (mot_path, phase, seq))
-            seq_trk_1 = np.loadtxt('%s/%s.txt' % (outFolder1, seq), delimiter=',')  # load trackers of file 1
-            seq_trk_2 = np.loadtxt('%s/%s.txt' % (outFolder2, seq), delimiter=',')  # load trackers of file 2
+            # both outputs are parsed (or memory-mapped if they are binary) once and their boxes are
+            # [x1,y1,x2,y2] slices of every frame
+            seq_trk_1 = mot_source.load_mot(results_sink.output_path(outFolder1, seq))  # load trackers of file 1
+            seq_trk_2 = mot_source.load_mot(results_sink.output_path(outFolder2, seq))  # load trackers of file 2
+            diff = output_diff.OutputDiff(args.iou_threshold, args.shift_iou)
+            last_frame = max(seq_trk_1.last_frame, seq_trk_2.last_frame)
 
-            if not os.path.exists('%s/%s' % (common_path, imgFolder)):
-                os.makedirs('%s/%s' % (common_path, imgFolder))
-
-            for frame in tqdm(range(int(seq_trk_1[:, 0].max()))):
+            if not args.no_images:
+                if not os.path.exists('%s/%s' % (common_path, imgFolder)):
+                    os.makedirs('%s/%s' % (common_path, imgFolder))
+                # images of the next frames are decoded while the current one is drawn
+                reader = frame_source.FrameReader(common_path, last_frame=last_frame)
+            for frame in tqdm(range(last_frame)):
                 frame += 1  # detection and frame numbers begin at 1
-                trks1 = seq_trk_1[seq_trk_1[:, 0] == frame, 2:7]
-                trks2 = seq_trk_2[seq_trk_2[:, 0] == frame, 2:7]
-                trks1[:, 2:4] += trks1[:, 0:2]  # convert to [x1,y1,w,h] to [x1,y1,x2,y2]
-                trks2[:, 2:4] += trks2[:, 0:2]  # convert to [x1,y1,w,h] to [x1,y1,x2,y2]
-                matches = association.find_new_trackers(trks1, trks2)
-                unmatched_trks1 = []
-                for t1, trk1 in enumerate(trks1):
-                    if t1 not in matches[:, 0]:
-                        unmatched_trks1.append(trk1)
-                unmatched_trks2 = []
-                for t2, trk2 in enumerate(trks2):
-                    if t2 not in matches[:, 0]:
-                        unmatched_trks2.append(trk2)
+                trks1 = seq_trk_1[frame]
+                trks2 = seq_trk_2[frame]
+                matches, ious = diff.update(frame, trks1, seq_trk_1.frame_ids(frame), trks2,
+                                            seq_trk_2.frame_ids(frame))
+                if args.no_images:
+                    continue
+                # boxes of file 1 and file 2 without match
+                unmatched_trks1 = np.delete(trks1, matches[:, 0], axis=0)
+                unmatched_trks2 = np.delete(trks2, matches[:, 1], axis=0)
 
-                img = Image.open('%s/img1/%06d.jpg' % (common_path, frame))
-                im = np.array(img, dtype=np.uint8)
+                im = reader.get(frame)
                 fig, ax = plt.subplots(1, figsize=(19.5, 11))
                 ax.imshow(im)
                 for m in range(len(matches)):
@@ -79,6 +104,14 @@ if __name__ == '__main__':
                 fig.tight_layout()
                 fig.savefig('%s/%s/%06d.jpg' % (common_path, imgFolder, frame))
                 plt.close(fig)
+            if not args.no_images:
+                reader.close()
+
+            diff.save('%s/%s.npz' % (diffFolder, seq))
+            line = '%s: %s' % (seq, output_diff.format_summary(diff.summary()))
+            print(line)
+            print(line, file=sum_file)
+        sum_file.close()
 
     print('Showing difference is finished')
 
@@ -0,0 +1,41 @@
+from __future__ import print_function
+import argparse
+
+# new imports
+from libs import sweep
+
+
+def parse_args():
+    """Parse input arguments."""
+    parser = argparse.ArgumentParser(description='SORT with occlusion handling parameter sweep')
+    parser.add_argument('--workers', dest='workers', help='Number of processes that run grid points in parallel [1]',
+                        type=int, default=1)
+    parser.add_argument('--cache_dir', dest='cache_dir',
+                        help='Folder of parsed det/gt caches, by default next to the det/gt files [None]',
+                        default=None)
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+    # train sequences
+    sequences = ['MOT17-02-DPM', 'MOT17-04-DPM', 'MOT17-05-DPM', 'MOT17-09-DPM', 'MOT17-10-DPM',
+                 'MOT17-11-DPM', 'MOT17-13-DPM',
+                 'MOT17-02-FRCNN', 'MOT17-04-FRCNN', 'MOT17-05-FRCNN', 'MOT17-09-FRCNN', 'MOT17-10-FRCNN',
+                 'MOT17-11-FRCNN', 'MOT17-13-FRCNN',
+                 'MOT17-02-SDP', 'MOT17-04-SDP', 'MOT17-05-SDP', 'MOT17-09-SDP', 'MOT17-10-SDP',
+                 'MOT17-11-SDP', 'MOT17-13-SDP']
+    phase = 'train'     # 'test'
+    # parameters that are not in the grid keep their default values (sweep.sweep_defaults)
+    grid = {'conf_trgt': [c / 100 for c in range(50, 90, 5)],
+            'conf_objt': [c / 100 for c in range(50, 100, 5)]}
+    # confidence threshold for occlusion by other objects is not lower than for occlusion by targets
+    keep = lambda point: point['conf_objt'] >= point['conf_trgt']
+    outRoot = 'outputs/sweep_OH'
+    mot_path = 'C:/Users/mhnas/Courses/Thesis/MOT/MOT17'
+    args = parse_args()
+
+    points = sweep.grid_points(grid, keep)
+    results = sweep.run_sweep(points, sequences, mot_path, phase, outRoot, workers=args.workers,
+                              cache_dir=args.cache_dir)
+    print('Sweep of %d grid points is finished, results are in %s/sweep_%s.csv' % (len(results), outRoot, phase))